@@ -0,0 +1,58 @@
+"""
+Recall@k and latency of the approximate faiss index types against the exact flat index.
+
+    python -m benchmarks.bench_ann --vectors 100000 --dimension 768
+    python -m benchmarks.bench_ann --encoder all-mpnet-base-v2 --cache-dir .embeddings
+"""
+import argparse
+import numpy as np
+
+from src.ann import index_config, recall_report
+from src.embeddings import EmbeddingStore
+
+
+def clustered_vectors(count, dimension, clusters=256, seed=0):
+    # Embeddings are clustered by topic, uniform random vectors would understate IVF recall
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(clusters, dimension)).astype(np.float32)
+    vectors = centers[rng.integers(clusters, size=count)] + 0.3 * rng.normal(size=(count, dimension)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--encoder", help="Take the vectors from the embedding store of this encoder")
+    parser.add_argument("--cache-dir", default=".embeddings")
+    parser.add_argument("--vectors", type=int, default=50000)
+    parser.add_argument("--dimension", type=int, default=768)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--json", help="Write the report to this file")
+    args = parser.parse_args()
+
+    if args.encoder:
+        vectors = np.asarray(EmbeddingStore(args.encoder, args.cache_dir).vectors())
+    else:
+        vectors = clustered_vectors(args.vectors, args.dimension)
+
+    rng = np.random.default_rng(1)
+    queries = vectors[rng.choice(len(vectors), min(args.queries, len(vectors)), replace=False)]
+    queries = queries + 0.05 * rng.normal(size=queries.shape).astype(np.float32)
+
+    nlist = max(16, int(4 * np.sqrt(len(vectors))))
+    pq_m = next(m for m in (64, 32, 16, 8, 4, 2, 1) if vectors.shape[1] % m == 0 and m <= max(1, vectors.shape[1] // 4))
+    configs = [
+        index_config("ivf_flat", nlist=nlist, nprobe=8),
+        index_config("ivf_flat", nlist=nlist, nprobe=32),
+        index_config("hnsw", M=32, efSearch=32),
+        index_config("hnsw", M=32, efSearch=128),
+        index_config("ivf_pq", nlist=nlist, nprobe=32, pq_m=pq_m),
+    ]
+    report = recall_report(vectors, queries, configs, k=args.k)
+    print(report.to_string(index=False))
+    if args.json:
+        report.to_json(args.json, orient="records", indent=1)
+
+
+if __name__ == "__main__":
+    main()
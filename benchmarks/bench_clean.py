@@ -0,0 +1,75 @@
+"""
+Micro-benchmark of clean_up_rfc_text against the previous implementation.
+
+    python -m benchmarks.bench_clean --rfcs 200 --repeat 5
+"""
+import re
+import time
+import argparse
+
+from src.rfc import clean_up_rfc_text, iter_clean_rfc_lines
+from .synthetic import make_corpus
+
+
+def legacy_clean_up_rfc_text(text):
+    # Implementation before the streaming cleaner: per-line += and uncompiled patterns
+    result = ""
+    lines = text.splitlines()
+    last_line_was_empty = False
+
+    for line in lines:
+        if not line.strip():
+            if last_line_was_empty:
+                continue
+            last_line_was_empty = True
+            result += "\n"
+            continue
+        else:
+            last_line_was_empty = False
+
+        if re.search(r"\[Page \d+\]", line):
+            continue
+
+        if re.search(r"^RFC \d{4}", line) and re.search(r"January|February|March|April|May|June|July|August|September|October|November|December", line):
+            continue
+
+        result += line + "\n"
+
+    return result
+
+
+def best_of(function, texts, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for text in texts:
+            function(text)
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rfcs", type=int, default=200)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    texts = list(make_corpus(args.rfcs).values())
+    # A single multi-megabyte document shows the cost of repeated string concatenation
+    texts.append("".join(texts))
+
+    for text in texts:
+        assert clean_up_rfc_text(text) == legacy_clean_up_rfc_text(text)
+
+    megabytes = sum(map(len, texts)) / 1e6
+    results = {
+        "legacy": best_of(legacy_clean_up_rfc_text, texts, args.repeat),
+        "clean_up_rfc_text": best_of(clean_up_rfc_text, texts, args.repeat),
+        "iter_clean_rfc_lines": best_of(lambda text: "\n".join(iter_clean_rfc_lines(text.splitlines())), texts, args.repeat),
+    }
+    for name, seconds in results.items():
+        print(f"{name:<22} {seconds:8.3f}s  {megabytes / seconds:8.1f} MB/s  {results['legacy'] / seconds:5.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,52 @@
+"""
+Memory use and pickling of rfc_df/section_df against the compact corpus representation.
+
+    python -m benchmarks.bench_compact --synthetic 1000
+    python -m benchmarks.bench_compact --first 1 --last 9700 --mirror-dir rfc_mirror
+"""
+import json
+import argparse
+import tempfile
+
+from src.rfc import setup_rfc_datasets
+from src.compact import CompactCorpus, memory_report
+from .synthetic import make_corpus, write_mirror
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--synthetic", type=int, help="Use this many synthetic RFCs instead of the RFC series")
+    parser.add_argument("--first", type=int, default=1)
+    parser.add_argument("--last", type=int, default=9700)
+    parser.add_argument("--mirror-dir")
+    parser.add_argument("--cache-dir", default=".rfc_cache")
+    parser.add_argument("--json", help="Write the report to this file")
+    args = parser.parse_args()
+
+    if args.synthetic:
+        corpus = make_corpus(args.synthetic)
+        mirror_dir = tempfile.mkdtemp()
+        write_mirror(corpus, mirror_dir)
+        rfc_df, section_df = setup_rfc_datasets(list(corpus), mirror_dir=mirror_dir, cache_dir=None)
+    else:
+        rfc_df, section_df = setup_rfc_datasets(
+            list(range(args.first, args.last + 1)),
+            mirror_dir=args.mirror_dir,
+            cache_dir=args.cache_dir,
+            missing="skip"
+        )
+
+    corpus = CompactCorpus.from_frames(rfc_df, section_df)
+    report = {**memory_report(rfc_df, section_df, corpus), **{
+        f"compact_{name}_bytes": size for name, size in corpus.memory_usage().items()
+    }}
+
+    for name, value in report.items():
+        print(f"{name:<26} {value:,.3f}" if isinstance(value, float) else f"{name:<26} {value:,}")
+    if args.json:
+        with open(args.json, "w") as file:
+            json.dump(report, file, indent=2)
+
+
+if __name__ == "__main__":
+    main()
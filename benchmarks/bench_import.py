@@ -0,0 +1,106 @@
+"""
+Start-up time of short-lived processes: each scenario runs in a fresh interpreter, which imports what it needs
+and runs its first call, and reports its own timings and which heavy backends ended up loaded.
+
+    python -m benchmarks.bench_import --repeat 5 --budget 1.0
+    python -m benchmarks.bench_import --scenarios keyword_search semantic_import
+"""
+import os
+import sys
+import time
+import json
+import argparse
+import tempfile
+import subprocess
+import numpy as np
+
+from pathlib import Path
+
+
+ROOT = Path(__file__).resolve().parents[1]
+HEAVY_MODULES = [
+    "torch", "sentence_transformers", "datasets", "faiss", "scipy", "ollama", "parse_llm_code",
+    "langchain_core", "langchain_openai", "langchain_anthropic", "langchain_google_genai", "langchain_community",
+]
+
+# Each scenario is (setup, first call), both timed inside the child process
+SCENARIOS = {
+    "interpreter": ("", ""),
+    "keyword_search": (
+        "import pandas as pd\nfrom src.search import search_sections",
+        "sections = pd.DataFrame({'rfc': [1, 1, 2], 'section_number': ['1.', '2.', '1.'], 'content': "
+        "['The retransmission timeout MUST be set.', 'Nothing here.', 'A timeout MAY occur.']})\n"
+        "search_sections(sections, keywords=['timeout'])\n"
+        "search_sections(sections, regex=r'time\\w+')",
+    ),
+    "corpus_import": ("from src.rfc import setup_rfc_datasets", ""),
+    "llm_import": ("from src.ai import query_model, setup_llm", ""),
+    "semantic_import": ("from src.index import HFSTIndex", ""),
+}
+
+CHILD = """
+import sys, time, json
+started = time.perf_counter()
+{setup}
+imported = time.perf_counter()
+{call}
+done = time.perf_counter()
+print(json.dumps({{
+    "import_seconds": imported - started,
+    "call_seconds": done - imported,
+    "loaded": [name for name in {heavy!r} if name in sys.modules],
+}}))
+"""
+
+
+def run_scenario(name, workdir):
+    """
+    Runs scenario name in a new interpreter, returning its own timings plus the wall time of the whole process.
+    """
+    setup, call = SCENARIOS[name]
+    code = CHILD.format(setup=setup, call=call, heavy=HEAVY_MODULES)
+    env = {**os.environ, "PYTHONPATH": os.pathsep.join(filter(None, [str(ROOT), os.environ.get("PYTHONPATH")]))}
+
+    started = time.perf_counter()
+    output = subprocess.run(
+        [sys.executable, "-c", code], cwd=workdir, env=env, capture_output=True, text=True, check=True
+    ).stdout
+    result = json.loads(output.strip().splitlines()[-1])
+    result["process_seconds"] = time.perf_counter() - started
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--scenarios", nargs="+", choices=list(SCENARIOS), default=list(SCENARIOS))
+    parser.add_argument("--repeat", type=int, default=3, help="Processes started per scenario, the median is reported")
+    parser.add_argument("--budget", type=float, help="Exit with status 1 if keyword_search takes longer (seconds)")
+    parser.add_argument("--json", help="Write the report to this file")
+    args = parser.parse_args()
+
+    report = {}
+    # Runs in an empty directory, so the keyword index files written by the first call are not reused
+    with tempfile.TemporaryDirectory() as workdir:
+        for name in args.scenarios:
+            runs = [run_scenario(name, workdir) for _ in range(args.repeat)]
+            report[name] = {
+                key: float(np.median([run[key] for run in runs]))
+                for key in ("process_seconds", "import_seconds", "call_seconds")
+            }
+            report[name]["loaded"] = runs[-1]["loaded"]
+
+    print(f"{'scenario':<18} {'process':>9} {'import':>9} {'call':>9}  heavy modules loaded")
+    for name, row in report.items():
+        print(f"{name:<18} {row['process_seconds']:>8.3f}s {row['import_seconds']:>8.3f}s {row['call_seconds']:>8.3f}s  "
+              f"{', '.join(row['loaded']) or '-'}")
+
+    if args.json:
+        with open(args.json, "w") as file:
+            json.dump(report, file, indent=2)
+    if args.budget is not None and "keyword_search" in report and report["keyword_search"]["process_seconds"] > args.budget:
+        print(f"keyword_search took {report['keyword_search']['process_seconds']:.3f}s, over the {args.budget}s budget.")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+"""
+Compares two benchmark reports written by benchmarks.run.
+
+    python -m benchmarks.compare before.json after.json --threshold 0.1 --fail
+"""
+import sys
+import json
+import argparse
+
+
+def compare(before, after, threshold=0.1):
+    """
+    Returns one row per stage present in both reports with the throughput, p50 latency and peak memory
+    ratios (after / before) and whether the throughput dropped by more than threshold.
+    """
+    rows = []
+    for stage, new in after["stages"].items():
+        old = before["stages"].get(stage)
+        if old is None:
+            continue
+        throughput = new["throughput"] / old["throughput"] if old["throughput"] else None
+        rows.append({
+            "stage": stage,
+            "throughput_before": old["throughput"],
+            "throughput_after": new["throughput"],
+            "throughput_ratio": throughput,
+            "p50_ratio": new["p50_ms"] / old["p50_ms"] if old["p50_ms"] else None,
+            "memory_ratio": new["peak_memory_bytes"] / old["peak_memory_bytes"] if old["peak_memory_bytes"] else None,
+            "regression": throughput is not None and throughput < 1 - threshold,
+        })
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("before")
+    parser.add_argument("after")
+    parser.add_argument("--threshold", type=float, default=0.1, help="Relative throughput drop reported as regression")
+    parser.add_argument("--fail", action="store_true", help="Exit with status 1 if any stage regressed")
+    args = parser.parse_args()
+
+    with open(args.before) as file:
+        before = json.load(file)
+    with open(args.after) as file:
+        after = json.load(file)
+
+    for report in (before, after):
+        meta = report["meta"]
+        print(f"{meta.get('commit') or '?':.12}  {meta['rfcs']} RFCs, {meta['sections']} sections, {meta['timestamp']}")
+    if (before["meta"]["rfcs"], before["meta"]["seed"]) != (after["meta"]["rfcs"], after["meta"]["seed"]):
+        print("Warning: the reports were run on different corpora.")
+
+    rows = compare(before, after, threshold=args.threshold)
+    print(f"\n{'stage':<28} {'before/s':>12} {'after/s':>12} {'speedup':>8} {'p50':>8} {'memory':>8}")
+    for row in rows:
+        ratios = [row[key] for key in ("throughput_ratio", "p50_ratio", "memory_ratio")]
+        ratios = [f"{ratio:.2f}x" if ratio is not None else "-" for ratio in ratios]
+        flag = "  REGRESSION" if row["regression"] else ""
+        print(f"{row['stage']:<28} {row['throughput_before']:>12.1f} {row['throughput_after']:>12.1f} "
+              f"{ratios[0]:>8} {ratios[1]:>8} {ratios[2]:>8}{flag}")
+
+    if args.fail and any(row["regression"] for row in rows):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
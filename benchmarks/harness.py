@@ -0,0 +1,68 @@
+"""
+Timing and memory measurement shared by the benchmark suite.
+"""
+import gc
+import time
+import tracemalloc
+import numpy as np
+
+
+def percentiles(latencies):
+    latencies = np.asarray(latencies, dtype=np.float64)
+    return {f"p{q}_ms": float(np.percentile(latencies, q) * 1000) for q in (50, 90, 99)}
+
+
+def measure(operations, items, repeat=3, setup=None):
+    """
+    Times a stage given as a list of callables (e.g. one per RFC or query).
+
+    Every repetition runs all operations once, after calling setup() if given. The fastest repetition gives
+    the throughput, latency percentiles are taken over the single operations of all repetitions. Peak memory
+    is traced in a separate repetition, as tracing slows the code down.
+
+    Args:
+        operations(List[Callable]): Operations of the stage.
+        items(int): Number of items (RFCs, sections, queries, ...) one repetition processes.
+        repeat(int, optional): Number of timed repetitions.
+        setup(Callable, optional): Called untimed before every repetition, e.g. to clear caches.
+
+    Returns:
+        dict with items, operations, repeat, seconds (fastest repetition), throughput (items/s),
+        mean_ms, p50_ms, p90_ms, p99_ms per operation and peak_memory_bytes.
+    """
+    latencies, totals = [], []
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        gc.collect()
+        total = 0.0
+        for operation in operations:
+            start = time.perf_counter()
+            operation()
+            elapsed = time.perf_counter() - start
+            latencies.append(elapsed)
+            total += elapsed
+        totals.append(total)
+
+    if setup is not None:
+        setup()
+    gc.collect()
+    tracemalloc.start()
+    try:
+        for operation in operations:
+            operation()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    seconds = min(totals)
+    return {
+        "items": items,
+        "operations": len(operations),
+        "repeat": repeat,
+        "seconds": seconds,
+        "throughput": items / seconds if seconds else None,
+        "mean_ms": float(np.mean(latencies) * 1000),
+        **percentiles(latencies),
+        "peak_memory_bytes": peak,
+    }
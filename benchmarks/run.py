@@ -0,0 +1,168 @@
+"""
+Offline benchmark suite of the ingestion, search and LLM pipelines on the synthetic corpus.
+
+The LLM is replaced by benchmarks.stubs.StubModel and the sentence encoder by a HashingEncoder,
+so results measure the pipeline code itself and are comparable across commits:
+
+    python -m benchmarks.run --size small --json before.json
+    python -m benchmarks.run --size small --json after.json
+    python -m benchmarks.compare before.json after.json
+"""
+import io
+import sys
+import json
+import time
+import shutil
+import argparse
+import platform
+import tempfile
+import subprocess
+import contextlib
+import numpy as np
+
+from pathlib import Path
+
+import src.lexical
+from src.rfc import clean_up_rfc_text, extract_sections, link_sections, parse_rfc, setup_rfc_datasets
+from src.index import HFSTIndex
+from src.search import SectionSearcher, filter_and_analyze_sections
+from src.templates import KEYWORDS, SEARCH_QUERIES, AvailabilityRequirement
+from .harness import measure
+from .stubs import install_stubs
+from .synthetic import SIZES, make_corpus, write_mirror
+
+
+STAGES = [
+    "clean_up_rfc_text", "extract_sections", "parse_rfc", "link_sections", "setup_rfc_datasets",
+    "index_build", "index_search", "search_keywords", "search_keywords_cold", "search_regex", "search_semantic",
+    "search_llm", "search_llm_batched", "filter_and_analyze_sections",
+]
+QUERIES = list(SEARCH_QUERIES.values()) + [
+    "timeouts and error conditions", "certificate extension encoding", "obsoleted algorithms", "DER encoding of a field",
+]
+REGEXES = [r"MUST\s+NOT", r"Section \d+\.\d+\.", r"\[\d{4}\]"]
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_stages(stages, corpus, mirror_dir, work_dir, repeat):
+    texts = list(corpus.values())
+    cleaned = [clean_up_rfc_text(text) for text in texts]
+    rfc_df, section_df = setup_rfc_datasets(list(corpus), mirror_dir=mirror_dir, cache_dir=None)
+    sections = len(section_df)
+
+    def fresh_dir(name):
+        path = Path(work_dir) / name
+        shutil.rmtree(path, ignore_errors=True)
+        return path
+
+    state = {}
+
+    def reset_links():
+        state["sections"] = section_df.copy()
+        state["sections"]["updated_by"] = [[] for _ in range(sections)]
+        state["sections"]["obsoleted_by"] = [[] for _ in range(sections)]
+
+    searcher = SectionSearcher(section_df, index_encoder="hashing", keyword_index_dir=None, cache_dir=fresh_dir("search"))
+
+    def cold_searcher():
+        # A corpus just built: no keyword index loaded or saved yet
+        src.lexical._keyword_indexes.clear()
+        state["cold_searcher"] = SectionSearcher(section_df, keyword_index_dir=fresh_dir("lexical"))
+
+    stage_functions = {
+        "clean_up_rfc_text": lambda: measure([lambda text=text: clean_up_rfc_text(text) for text in texts], len(texts), repeat),
+        "extract_sections": lambda: measure([lambda text=text: extract_sections(text) for text in cleaned], len(texts), repeat),
+        "parse_rfc": lambda: measure(
+            [lambda rfc=rfc, text=text: parse_rfc(rfc, text) for rfc, text in corpus.items()], len(texts), repeat),
+        "link_sections": lambda: measure(
+            [lambda: link_sections(rfc_df, state["sections"])], sections, repeat, setup=reset_links),
+        "setup_rfc_datasets": lambda: measure(
+            [lambda: setup_rfc_datasets(list(corpus), mirror_dir=mirror_dir, cache_dir=None)], len(texts), repeat),
+        "index_build": lambda: measure(
+            [lambda: HFSTIndex(section_df, index_encoder="hashing", index_src_col="content", cache_dir=state["index_dir"])],
+            sections, repeat, setup=lambda: state.update(index_dir=fresh_dir("index"))),
+        "index_search": lambda: measure(
+            [lambda query=query: searcher.index.search(query, k=10) for query in QUERIES], len(QUERIES), repeat),
+        "search_keywords": lambda: measure(
+            [lambda group=group: searcher.search(keywords=group) for group in KEYWORDS.values()], len(KEYWORDS), repeat),
+        "search_keywords_cold": lambda: measure(
+            [lambda group=group: state["cold_searcher"].search(keywords=group) for group in KEYWORDS.values()],
+            len(KEYWORDS), repeat, setup=cold_searcher),
+        "search_regex": lambda: measure(
+            [lambda regex=regex: searcher.search(regex=regex) for regex in REGEXES], len(REGEXES), repeat),
+        "search_semantic": lambda: measure(
+            [lambda query=query: searcher.search(search_query=query, num_sections=10) for query in QUERIES], len(QUERIES), repeat),
+        "search_llm": lambda: measure(
+            [lambda: searcher.search(search_query="timeouts", use_llm=True)], sections, repeat),
+        "search_llm_batched": lambda: measure(
+            [lambda: searcher.search(search_query="timeouts", use_llm=True, batch_tokens=4000)], sections, repeat),
+        "filter_and_analyze_sections": lambda: measure(
+            [lambda: filter_and_analyze_sections(section_df, AvailabilityRequirement)], sections, repeat),
+    }
+
+    # Warm up the semantic index and the keyword index outside of the measured stages
+    searcher.index
+    searcher.keyword_index
+
+    results = {}
+    for stage in stages:
+        print(f"{stage}...", file=sys.stderr)
+        with contextlib.redirect_stdout(io.StringIO()):
+            results[stage] = stage_functions[stage]()
+    return results, len(texts), sections
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--size", choices=list(SIZES), default="small")
+    parser.add_argument("--rfcs", type=int, help="Number of synthetic RFCs, overrides --size")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--stages", nargs="+", choices=STAGES, default=STAGES)
+    parser.add_argument("--llm-latency", type=float, default=0.0, help="Simulated seconds per LLM call")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", help="Write the results to this file")
+    args = parser.parse_args()
+
+    num_rfcs = args.rfcs or SIZES[args.size]
+    stub = install_stubs(latency=args.llm_latency)
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        corpus = make_corpus(num_rfcs, seed=args.seed)
+        mirror_dir = write_mirror(corpus, Path(work_dir) / "mirror")
+        results, rfcs, sections = run_stages(args.stages, corpus, mirror_dir, work_dir, args.repeat)
+
+    report = {
+        "meta": {
+            "commit": git_commit(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "numpy": np.__version__,
+            "size": args.size if not args.rfcs else None,
+            "rfcs": rfcs,
+            "sections": sections,
+            "seed": args.seed,
+            "repeat": args.repeat,
+            "llm_latency": args.llm_latency,
+            "llm_calls": stub.calls,
+        },
+        "stages": results,
+    }
+
+    print(f"{'stage':<28} {'items/s':>12} {'p50 ms':>10} {'p99 ms':>10} {'peak MB':>10}")
+    for stage, result in results.items():
+        print(f"{stage:<28} {result['throughput']:>12.1f} {result['p50_ms']:>10.3f} {result['p99_ms']:>10.3f} "
+              f"{result['peak_memory_bytes'] / 1e6:>10.1f}")
+    if args.json:
+        with open(args.json, "w") as file:
+            json.dump(report, file, indent=2)
+
+
+if __name__ == "__main__":
+    main()
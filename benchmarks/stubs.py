@@ -0,0 +1,93 @@
+"""
+Offline stand-ins for the LLM and the sentence encoder, so the pipelines can be benchmarked without a GPU,
+an Ollama server or downloaded models.
+"""
+import re
+import time
+import hashlib
+import numpy as np
+
+from types import SimpleNamespace
+
+
+SECTION_RE = re.compile(r"### Section (\d+)")
+
+
+class HashingEncoder:
+    """
+    Small deterministic encoder with the SentenceTransformer interface: bag of hashed words, L2-normalized.
+    """
+
+    def __init__(self, name="hashing", dimension=256):
+        self.name = name
+        self.dimension = dimension
+        self._buckets = {}
+
+    def to(self, device):
+        return self
+
+    def _bucket(self, word):
+        if word not in self._buckets:
+            self._buckets[word] = int(hashlib.md5(word.encode("utf-8")).hexdigest(), 16) % self.dimension
+        return self._buckets[word]
+
+    def encode(self, texts, batch_size=32, **kwargs):
+        single = isinstance(texts, str)
+        texts = [texts] if single else list(texts)
+
+        vectors = np.zeros((len(texts), self.dimension), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for word in text.lower().split():
+                vectors[row, self._bucket(word)] += 1
+        vectors /= np.linalg.norm(vectors, axis=1, keepdims=True) + 1e-9
+        return vectors[0] if single else vectors
+
+
+class StubModel:
+    """
+    Replacement for ai._query_model answering deterministically from the prompt: a section is relevant
+    if it contains keyword. latency simulates the response time of a real model.
+    """
+
+    def __init__(self, keyword="timeout", latency=0.0):
+        self.keyword = keyword
+        self.latency = latency
+        self.calls = 0
+
+    def __call__(self, model, messages, parse_code, parse_json, schema, tools, options):
+        self.calls += 1
+        if self.latency:
+            time.sleep(self.latency)
+
+        prompt = messages[-1]["content"]
+        section = prompt.split("# INPUT")[-1]
+
+        if parse_json:
+            excerpts = [sentence.strip() for sentence in section.split(".") if self.keyword in sentence]
+            output = [{"excerpt": excerpt} for excerpt in excerpts[:3]]
+            return SimpleNamespace(content=str(output)), output
+
+        parts = SECTION_RE.split(section)
+        if len(parts) > 1:
+            answer = "\n".join(
+                f"{number}: {'YES' if self.keyword in text else 'NO'}" for number, text in zip(parts[1::2], parts[2::2])
+            )
+        else:
+            answer = "YES" if self.keyword in section else "NO"
+        return SimpleNamespace(content=answer), None
+
+
+def install_stubs(keyword="timeout", latency=0.0, encoder=True):
+    """
+    Routes all query_model calls to a StubModel and, with encoder, loads a HashingEncoder for every encoder name.
+    Returns the StubModel.
+    """
+    import src.ai
+    import src.index
+
+    stub = StubModel(keyword=keyword, latency=latency)
+    src.ai._query_model = stub
+    if encoder:
+        src.index.SentenceTransformer = HashingEncoder
+        src.index.load_encoder.cache_clear()
+    return stub
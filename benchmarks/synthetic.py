@@ -0,0 +1,107 @@
+import random
+
+from pathlib import Path
+
+
+WORDS = [
+    "the", "protocol", "MUST", "SHOULD", "MAY", "certificate", "extension", "field", "attribute",
+    "element", "timeout", "server", "client", "message", "value", "encoding", "CER", "DER", "ASN.1",
+    "section", "update", "obsolete", "reference", "algorithm", "key", "availability", "denial",
+]
+
+SIZES = {
+    "small": 20,
+    "medium": 200,
+    "large": 1000,
+}
+
+
+def _title(rng, max_words):
+    return " ".join(rng.choice(WORDS).capitalize() for _ in range(rng.randint(1, max_words)))
+
+
+def make_rfc_text(number, updates=(), obsoletes=(), references=(), num_sections=12, max_subsections=4, max_paragraphs=6, seed=0):
+    """
+    Generates a plain-text RFC with header, table of contents, numbered sections, page footers and running headers.
+    """
+    rng = random.Random(seed * 100003 + number)
+
+    titles = []
+    for i in range(1, num_sections + 1):
+        titles.append((f"{i}.", "Introduction" if i == 1 else _title(rng, 4)))
+        for j in range(1, rng.randint(0, max_subsections) + 1):
+            titles.append((f"{i}.{j}.", _title(rng, 5)))
+
+    header = [
+        "Internet Engineering Task Force (IETF)                          A. Author",
+        f"Request for Comments: {number:<38}Example Corp",
+    ]
+    if obsoletes:
+        header.append(f"Obsoletes: {', '.join(map(str, obsoletes)):<49}B. Other")
+    if updates:
+        header.append(f"Updates: {', '.join(map(str, updates)):<51}Other Inc")
+    header += [
+        "Category: Standards Track                                       May 2008",
+        "ISSN: 2070-1721",
+    ]
+
+    lines = header + ["", "", f"          Synthetic Specification {number}", "", "Abstract", "",
+                      "   This document is generated for benchmarking.", "", "Table of Contents", ""]
+    for page, (section_number, title) in enumerate(titles, 3):
+        entry = "   " * section_number.count(".") + f"{section_number} {title} "
+        lines.append(entry + "." * max(3, 66 - len(entry)) + f" {page}")
+    lines.append("")
+
+    for section_number, title in titles:
+        lines += [f"{section_number}  {title}", ""]
+        for _ in range(rng.randint(1, max_paragraphs)):
+            words = [rng.choice(WORDS) for _ in range(rng.randint(20, 80))]
+            if updates and rng.random() < 0.3:
+                words.insert(rng.randrange(len(words)), f"Section {rng.choice(titles)[0]}")
+            if references and rng.random() < 0.3:
+                words.insert(rng.randrange(len(words)), f"[{rng.choice(references)}]")
+            paragraph = " ".join(words)
+            lines += ["   " + paragraph[i:i + 69] for i in range(0, len(paragraph), 69)]
+            lines.append("")
+
+    pages = []
+    for page, i in enumerate(range(0, len(lines), 52), 1):
+        pages += lines[i:i + 52]
+        pages += [
+            "",
+            f"Author                       Standards Track                   [Page {page}]",
+            "\f",
+            f"RFC {number}            Synthetic Specification             May 2008",
+            "",
+        ]
+    return "\n".join(pages) + "\n"
+
+
+def make_corpus(num_rfcs, first=1000, seed=0):
+    """
+    Returns {rfc number: text} for a corpus whose RFCs update, obsolete and cite earlier ones.
+    """
+    rng = random.Random(seed)
+    numbers = list(range(first, first + num_rfcs))
+    corpus = {}
+    for i, number in enumerate(numbers):
+        earlier = numbers[:i]
+        corpus[number] = make_rfc_text(
+            number,
+            updates=sorted(rng.sample(earlier, min(len(earlier), rng.randint(0, 2)))),
+            obsoletes=sorted(rng.sample(earlier, min(len(earlier), rng.choice([0, 0, 0, 1])))),
+            references=rng.sample(earlier, min(len(earlier), 5)),
+            seed=seed
+        )
+    return corpus
+
+
+def write_mirror(corpus, directory):
+    """
+    Writes a corpus as rfc<N>.txt files, usable as mirror_dir of setup_rfc_datasets.
+    """
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+    for number, text in corpus.items():
+        (directory / f"rfc{number}.txt").write_text(text)
+    return directory
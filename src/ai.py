@@ -2,18 +2,24 @@
 
 import os
 import json
-import ollama
+import time
+import pickle
+import random
+import logging
+import sqlite3
+import threading
 
 from typing import List
 from pydantic import BaseModel
-from parse_llm_code import extract_first_code
-from langchain_core.tools import StructuredTool
-from langchain_community.llms.huggingface_hub import HuggingFaceHub
-from langchain_community.chat_models.huggingface import ChatHuggingFace
-from langchain_openai import ChatOpenAI
-from langchain_anthropic import ChatAnthropic
-from langchain_google_genai import ChatGoogleGenerativeAI
-from langchain_core.output_parsers import JsonOutputParser
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from . import metrics
+from .registry import text_hash
+
+logger = logging.getLogger(__name__)
+
+# ollama, parse_llm_code and the LangChain providers take seconds to import together, each is imported
+# where it is first needed, a provider only once setup_llm selects it
 
 
 def setup_llm(
@@ -25,6 +31,7 @@ def setup_llm(
     Sets up a LangChain chat model based on the provided name.
     """
     if "openai" in name:
+        from langchain_openai import ChatOpenAI
         assert api_key, "Selecting an OpenAI model requires an api_key."
         model = ChatOpenAI(
             openai_api_key=api_key,
@@ -32,12 +39,14 @@ def setup_llm(
             **args
         )
     elif "anthropic" in name:
+        from langchain_anthropic import ChatAnthropic
         assert api_key, "Selecting an Anthropic model requires an api_key."
         os.environ["ANTHROPIC_API_KEY"] = api_key
         model = ChatAnthropic(
             model=name.split("/")[-1]
         )
     elif "google" in name or "gemini" in name:
+        from langchain_google_genai import ChatGoogleGenerativeAI
         assert api_key, "Selecting a Google model requires an api_key."
         os.environ["GOOGLE_API_KEY"] = api_key
         model = ChatGoogleGenerativeAI(
@@ -45,6 +54,8 @@ def setup_llm(
             **args
         )
     else:
+        from langchain_community.llms.huggingface_hub import HuggingFaceHub
+        from langchain_community.chat_models.huggingface import ChatHuggingFace
         llm = HuggingFaceHub(
             repo_id=name,
             task="text-generation",
@@ -55,6 +66,20 @@ def setup_llm(
     return model
 
 
+def estimate_tokens(text: str) -> int:
+    # Rough count for English text, about four characters per token
+    return len(text) // 4 + 1
+
+
+def context_size(messages, reply_tokens: int = 1024, minimum: int = 2048, maximum: int = 131072) -> int:
+    """
+    num_ctx that fits the estimated prompt and reply, rounded up to a power of two
+    so that Ollama only reloads the model for a few distinct context sizes.
+    """
+    needed = int(1.2 * sum(estimate_tokens(message["content"]) for message in messages)) + reply_tokens
+    return min(maximum, max(minimum, 1 << (needed - 1).bit_length()))
+
+
 def rindex(array, value) -> int:
     if value not in array:
         return -1
@@ -70,6 +95,141 @@ def parse_json_list_from_text(text):
     return json.loads(text[start:last + 1])
 
 
+class ResponseCache:
+    """
+    SQLite cache of query_model results, keyed by model, messages, options, schema and parsing mode.
+
+    Entries older than ttl seconds are ignored; above max_entries the least recently used ones are evicted.
+    """
+
+    def __init__(self, path: str = ".llm_cache.sqlite", ttl: float = None, max_entries: int = 100000):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS responses (key TEXT PRIMARY KEY, value BLOB, created REAL, accessed REAL)"
+        )
+        # Eviction and expiry walk these instead of scanning the table
+        self.connection.execute("CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed)")
+        self.connection.execute("CREATE INDEX IF NOT EXISTS responses_created ON responses (created)")
+        self.connection.commit()
+        self.entries = self.connection.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+
+    def get(self, key: str):
+        with self._lock:
+            row = self.connection.execute("SELECT value, created FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is None or (self.ttl is not None and time.time() - row[1] > self.ttl):
+                self.misses += 1
+                return None
+            self.hits += 1
+            self.connection.execute("UPDATE responses SET accessed = ? WHERE key = ?", (time.time(), key))
+            self.connection.commit()
+        return pickle.loads(row[0])
+
+    def put(self, key: str, value):
+        try:
+            blob = pickle.dumps(value)
+        except Exception:
+            return  # e.g. tool results that cannot be pickled are not cached
+
+        now = time.time()
+        with self._lock:
+            exists = self.connection.execute("SELECT 1 FROM responses WHERE key = ?", (key,)).fetchone()
+            self.connection.execute("INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?)", (key, blob, now, now))
+            self.entries += exists is None
+            if self.ttl is not None:
+                self.entries -= self.connection.execute(
+                    "DELETE FROM responses WHERE created < ?", (now - self.ttl,)
+                ).rowcount
+            if self.entries > self.max_entries:
+                # Other processes may share the file, so the count is refreshed before evicting
+                self.entries = self.connection.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+                excess = self.entries - self.max_entries
+                if excess > 0:
+                    self.entries -= self.connection.execute(
+                        "DELETE FROM responses WHERE key IN (SELECT key FROM responses ORDER BY accessed LIMIT ?)",
+                        (excess,)
+                    ).rowcount
+            self.connection.commit()
+
+    def clear(self):
+        with self._lock:
+            self.connection.execute("DELETE FROM responses")
+            self.connection.commit()
+            self.entries = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            entries = self.connection.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+        requests = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / requests if requests else 0.0,
+            "entries": entries
+        }
+
+
+response_cache = None
+
+
+def enable_response_cache(path: str = ".llm_cache.sqlite", ttl: float = None, max_entries: int = 100000):
+    """
+    Caches the results of all following query_model calls on disk.
+    """
+    global response_cache
+    response_cache = ResponseCache(path, ttl=ttl, max_entries=max_entries)
+    return response_cache
+
+
+def disable_response_cache():
+    global response_cache
+    response_cache = None
+
+
+def model_identifier(model) -> str:
+    if isinstance(model, str):
+        return f"ollama/{model}"
+    name = (
+        getattr(model, "model_name", None) or getattr(model, "model", None) or getattr(model, "model_id", None)
+        or getattr(model, "repo_id", None) or getattr(getattr(model, "llm", None), "repo_id", None)
+    )
+    return f"{type(model).__name__}/{name}"
+
+
+def model_parameters(model) -> dict:
+    """
+    Generation parameters of a LangChain model (temperature, max_tokens, ...), including those of the LLM
+    a chat wrapper such as ChatHuggingFace delegates to. Ollama models take theirs through options.
+    """
+    if isinstance(model, str):
+        return {}
+    parameters = {}
+    for component in (getattr(model, "llm", None), model):
+        try:
+            parameters.update(getattr(component, "_identifying_params", None) or {})
+        except Exception:
+            pass  # e.g. a provider whose parameters need a client that is not set up
+    return parameters
+
+
+def cache_key(model, messages, parse_code, parse_json, schema, tools, options) -> str:
+    payload = {
+        "model": model_identifier(model),
+        "parameters": model_parameters(model),
+        "messages": messages,
+        "options": options,
+        "schema": schema.model_json_schema() if schema else None,
+        "parse_code": parse_code,
+        "parse_json": parse_json,
+        "tools": [tool.__name__ for tool in tools],
+    }
+    return text_hash(json.dumps(payload, sort_keys=True, default=str))
+
+
 def query_model(
         model,
         messages,
@@ -77,15 +237,67 @@ def query_model(
         parse_json: bool = False,
         schema: BaseModel = None,
         tools: List = [],
-        options: dict = {}
+        options: dict = {},
+        cache: ResponseCache = None
     ):
     """
     Queries an LLM and handles response parsing, tool calls, and JSON validation.
+
+    Results are served from cache (or the cache set up by enable_response_cache) when available.
+    """
+    cache = cache if cache is not None else response_cache
+    if cache is None:
+        return _timed_query_model(model, messages, parse_code, parse_json, schema, tools, options)
+
+    key = cache_key(model, messages, parse_code, parse_json, schema, tools, options)
+    result = cache.get(key)
+    if result is None:
+        metrics.count("llm.cache.misses", backend=backend_name(model))
+        result = _timed_query_model(model, messages, parse_code, parse_json, schema, tools, options)
+        cache.put(key, result)
+    else:
+        metrics.count("llm.cache.hits", backend=backend_name(model))
+    return result
+
+
+def _timed_query_model(model, messages, parse_code, parse_json, schema, tools, options):
+    if not metrics.enabled():
+        return _query_model(model, messages, parse_code, parse_json, schema, tools, options)
+
+    backend = backend_name(model)
+    metrics.count("llm.requests", backend=backend)
+    with metrics.timer("llm.latency", backend=backend):
+        return _query_model(model, messages, parse_code, parse_json, schema, tools, options)
+
+
+def _record_usage(backend, response):
     """
+    Records the prompt and completion token counts reported by the backend for response, if any.
+    """
+    if not metrics.enabled():
+        return
+    if backend == "ollama":  # Ollama reports counts on the chat response
+        prompt = response.get("prompt_eval_count") if isinstance(response, dict) else getattr(response, "prompt_eval_count", None)
+        completion = response.get("eval_count") if isinstance(response, dict) else getattr(response, "eval_count", None)
+    else:  # LangChain messages carry usage_metadata
+        usage = getattr(response, "usage_metadata", None) or {}
+        prompt, completion = usage.get("input_tokens"), usage.get("output_tokens")
+
+    if prompt is not None:
+        metrics.count("llm.prompt_tokens", prompt, backend=backend)
+    if completion is not None:
+        metrics.count("llm.completion_tokens", completion, backend=backend)
+
+
+def _query_model(model, messages, parse_code, parse_json, schema, tools, options):
     available_functions = {tool.__name__: tool for tool in tools}
     assert not (len(tools) > 0 and parse_json), "Tools and JSON parsing cannot be used simultaneously."
+    backend = backend_name(model)
 
     if isinstance(model, str):  # Ollama case
+        import ollama
+        if "num_ctx" not in options:
+            options = {**options, "num_ctx": context_size(messages)}
         response = ollama.chat(
             model=model,
             messages=messages,
@@ -93,6 +305,7 @@ def query_model(
             format='json' if schema else '',
             options=options
         )
+        _record_usage(backend, response)
         message = response['message']
 
         if schema:
@@ -113,6 +326,7 @@ def query_model(
             except Exception:
                 return message, []
         elif parse_code:
+            from parse_llm_code import extract_first_code
             code = extract_first_code(message['content'])
             return message, code
         
@@ -127,9 +341,11 @@ def query_model(
 
     else:  # LangChain case
         if tools:
+            from langchain_core.tools import StructuredTool
             lc_tools = [StructuredTool.from_function(tool, parse_docstring=True) for tool in tools]
             model_with_tools = model.bind_tools(lc_tools)
             response = model_with_tools.invoke(messages)
+            _record_usage(backend, response)
             
             tool_outputs = []
             for tool_call in response.tool_calls:
@@ -142,6 +358,7 @@ def query_model(
             model = model.with_structured_output(schema)
         
         response = model.invoke(messages)
+        _record_usage(backend, response)
 
         if schema:
             # The response is already a Pydantic object
@@ -154,7 +371,150 @@ def query_model(
             except (json.JSONDecodeError, AttributeError):
                  return response, []
         elif parse_code:
+            from parse_llm_code import extract_first_code
             code = extract_first_code(response.content)
             return response, code
         else:
-            return response, None
\ No newline at end of file
+            return response, None
+
+
+class RateLimiter:
+    """
+    Token bucket allowing `rate` requests per second with bursts of up to `burst` requests, shared by all threads.
+    """
+
+    def __init__(self, rate: float, burst: int = 1):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+rate_limiters = {}
+
+
+def backend_name(model) -> str:
+    # Ollama models are given by name, LangChain models by their chat model class
+    return "ollama" if isinstance(model, str) else type(model).__name__
+
+
+def set_rate_limit(backend: str, requests_per_second: float, burst: int = 1):
+    """
+    Limits the request rate of a backend ("ollama" or a LangChain class name such as "ChatOpenAI").
+    """
+    rate_limiters[backend] = RateLimiter(requests_per_second, burst)
+
+
+# Rate limits, overloaded or restarting servers and timeouts; other HTTP errors will not go away on retry
+TRANSIENT_STATUS_CODES = {408, 425, 429, 500, 502, 503, 504}
+# Connection and timeout errors of httpx, requests and the openai/anthropic clients, matched by name so that
+# checking an error does not import those packages
+TRANSIENT_ERROR_NAMES = {"TransportError", "TimeoutException", "Timeout", "APIConnectionError", "APITimeoutError"}
+
+
+def is_transient_error(error: Exception) -> bool:
+    """
+    Whether a failed query is worth retrying: connection errors, timeouts and 408/429/5xx responses.
+    """
+    if isinstance(error, (ConnectionError, TimeoutError)):
+        return True
+    if any(cls.__name__ in TRANSIENT_ERROR_NAMES for cls in type(error).__mro__):
+        return True
+    # ollama.ResponseError and the openai/anthropic status errors carry status_code, google-api-core errors code
+    status = getattr(error, "status_code", None)
+    if status is None:
+        status = getattr(getattr(error, "response", None), "status_code", None)
+    if status is None:
+        status = getattr(error, "code", None)
+    return isinstance(status, int) and (status in TRANSIENT_STATUS_CODES or 500 <= status < 600)
+
+
+def query_model_with_retry(
+        model,
+        messages,
+        retries: int = 3,
+        backoff: float = 1.0,
+        **kwargs
+    ):
+    """
+    Calls query_model, respecting the backend's rate limit and retrying transient failures with exponential
+    backoff. Other errors (e.g. a missing model or an invalid request) are raised right away.
+    """
+    backend = backend_name(model)
+    limiter = rate_limiters.get(backend)
+    for attempt in range(retries + 1):
+        if limiter is not None:
+            limiter.acquire()
+        try:
+            return query_model(model, messages, **kwargs)
+        except Exception as e:
+            if attempt == retries or not is_transient_error(e):
+                raise
+            delay = backoff * 2 ** attempt * (1 + random.random() / 10)
+            metrics.count("llm.retries", backend=backend)
+            logger.warning("Query to %s failed (%s), retrying in %.1fs", backend, e, delay)
+            time.sleep(delay)
+
+
+def iter_query_model_concurrently(
+        model,
+        messages_list,
+        max_concurrency: int = 8,
+        retries: int = 3,
+        backoff: float = 1.0,
+        **kwargs
+    ):
+    """
+    Runs query_model for every list of messages with at most max_concurrency requests in flight.
+
+    Yields (position, (message, output)) as requests complete. messages_list may be any iterable and is consumed
+    lazily, so no more than max_concurrency prompts and results are held at a time.
+    """
+    messages_iter = enumerate(messages_list)
+    with ThreadPoolExecutor(max_workers=max_concurrency) as executor:
+        inflight = {}
+        while True:
+            for position, messages in messages_iter:
+                future = executor.submit(query_model_with_retry, model, messages, retries=retries, backoff=backoff, **kwargs)
+                inflight[future] = position
+                if len(inflight) >= max_concurrency:
+                    break
+            if not inflight:
+                return
+
+            done, _ = wait(inflight, return_when=FIRST_COMPLETED)
+            for future in done:
+                yield inflight.pop(future), future.result()
+
+
+def query_model_concurrently(
+        model,
+        messages_list: List[list],
+        max_concurrency: int = 8,
+        retries: int = 3,
+        backoff: float = 1.0,
+        **kwargs
+    ):
+    """
+    Runs query_model for every list of messages with at most max_concurrency requests in flight.
+
+    Returns the (message, output) pairs in the order of messages_list.
+    """
+    results = [None] * len(messages_list)
+    for position, result in iter_query_model_concurrently(
+            model, messages_list, max_concurrency=max_concurrency, retries=retries, backoff=backoff, **kwargs):
+        results[position] = result
+    return results
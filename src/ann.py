@@ -0,0 +1,133 @@
+import json
+import time
+import faiss
+import numpy as np
+import pandas as pd
+
+from pathlib import Path
+
+
+# Build parameters per index type; nprobe/efSearch only affect searching and can change without a rebuild
+DEFAULT_PARAMS = {
+    "flat": {},
+    "ivf_flat": {"nlist": 1024, "nprobe": 16},
+    "hnsw": {"M": 32, "efConstruction": 200, "efSearch": 64},
+    "ivf_pq": {"nlist": 1024, "nprobe": 16, "pq_m": 16, "nbits": 8},
+}
+SEARCH_PARAMS = ["nprobe", "efSearch"]
+
+
+def index_config(index_type="flat", **params):
+    """
+    Returns the full configuration of an index type, filling in defaults for missing parameters.
+    """
+    assert index_type in DEFAULT_PARAMS, f"Unknown index type {index_type}, expected one of {list(DEFAULT_PARAMS)}."
+    unknown = set(params) - set(DEFAULT_PARAMS[index_type])
+    assert not unknown, f"Unknown parameters {unknown} for index type {index_type}."
+    return {"index_type": index_type, **DEFAULT_PARAMS[index_type], **params}
+
+
+def config_name(config):
+    # Identifies the built index, search parameters are left out
+    build_params = [f"{key}{value}" for key, value in config.items() if key not in SEARCH_PARAMS + ["index_type"]]
+    return "-".join([config["index_type"]] + build_params)
+
+
+def factory_string(config):
+    if config["index_type"] == "ivf_flat":
+        return f"IVF{config['nlist']},Flat"
+    if config["index_type"] == "hnsw":
+        return f"HNSW{config['M']}"
+    if config["index_type"] == "ivf_pq":
+        return f"IVF{config['nlist']},PQ{config['pq_m']}x{config['nbits']}"
+    return "Flat"
+
+
+def set_search_params(index, config):
+    parameters = faiss.ParameterSpace()
+    for key in SEARCH_PARAMS:
+        if key in config:
+            parameters.set_index_parameter(index, key, config[key])
+
+
+def train_index(vectors, config, train_size=50000, seed=0):
+    """
+    Creates an empty faiss index for vectors and trains it on a random sample of at most train_size vectors.
+
+    nlist is reduced if there are too few vectors to train that many clusters, the effective value is kept in config.
+    """
+    vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+    if "nlist" in config:
+        # faiss wants roughly 39 training points per cluster
+        config["nlist"] = max(1, min(config["nlist"], len(vectors) // 39))
+
+    index = faiss.index_factory(vectors.shape[1], factory_string(config), faiss.METRIC_L2)
+    if config["index_type"] == "hnsw":
+        index.hnsw.efConstruction = config["efConstruction"]
+
+    if not index.is_trained:
+        sample = vectors
+        if len(vectors) > train_size:
+            sample = vectors[np.random.default_rng(seed).choice(len(vectors), train_size, replace=False)]
+        index.train(sample)
+
+    set_search_params(index, config)
+    return index
+
+
+def build_index(vectors, config, train_size=50000, seed=0):
+    index = train_index(vectors, config, train_size=train_size, seed=seed)
+    index.add(np.ascontiguousarray(vectors, dtype=np.float32))
+    return index
+
+
+def save_config(config, faiss_file):
+    Path(faiss_file).with_suffix(".json").write_text(json.dumps(config))
+
+
+def load_config(faiss_file):
+    config_file = Path(faiss_file).with_suffix(".json")
+    return json.loads(config_file.read_text()) if config_file.exists() else None
+
+
+def recall_report(vectors, queries, configs, k=10, train_size=50000):
+    """
+    Compares index configurations against the exact flat index.
+
+    Args:
+        vectors(np.ndarray): Vectors to index.
+        queries(np.ndarray): Query vectors.
+        configs(List[dict]): Configurations as returned by index_config.
+        k(int, optional): Number of neighbours for recall@k.
+
+    Returns:
+        DataFrame with build time, index size, search latency per query and recall@k of each configuration.
+    """
+    vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+    queries = np.ascontiguousarray(queries, dtype=np.float32)
+
+    rows = []
+    truth = None
+    for config in [index_config("flat")] + [dict(config) for config in configs]:
+        start = time.perf_counter()
+        index = build_index(vectors, config, train_size=train_size)
+        build_seconds = time.perf_counter() - start
+
+        start = time.perf_counter()
+        _, indices = index.search(queries, k)
+        search_seconds = time.perf_counter() - start
+
+        if truth is None:
+            truth = indices
+        recall = np.mean([len(set(found) & set(exact)) / k for found, exact in zip(indices, truth)])
+
+        rows.append({
+            "index": config_name(config),
+            "search_params": {key: config[key] for key in SEARCH_PARAMS if key in config},
+            "build_s": build_seconds,
+            "size_mb": faiss.serialize_index(index).nbytes / 1e6,
+            "latency_ms": 1000 * search_seconds / len(queries),
+            f"recall@{k}": recall,
+        })
+
+    return pd.DataFrame(rows)
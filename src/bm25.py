@@ -0,0 +1,139 @@
+import re
+import json
+import numpy as np
+import scipy.sparse as sp
+
+from pathlib import Path
+
+from .registry import Registry, corpus_fingerprint, text_hash
+
+
+TERM_RE = re.compile(r"\w+")
+MAX_BM25_INDEXES = 4  # number of BM25Index instances kept loaded by get_bm25_index
+
+
+def tokenize(text):
+    return TERM_RE.findall(text.lower())
+
+
+class BM25Index:
+    """
+    Okapi BM25 over a list of texts.
+
+    The BM25 weight of every (text, term) pair is precomputed into a sparse matrix with one column per term,
+    so scoring a query only sums the columns of its terms.
+    """
+
+    def __init__(self, vocabulary, weights, k1=1.5, b=0.75):
+        self.vocabulary = vocabulary
+        self.weights = weights.tocsc()
+        self.k1 = k1
+        self.b = b
+
+    @classmethod
+    def build(cls, texts, k1=1.5, b=0.75):
+        vocabulary = {}
+        indptr, indices = [0], []
+        for text in texts:
+            indices.extend(vocabulary.setdefault(term, len(vocabulary)) for term in tokenize(text))
+            indptr.append(len(indices))
+
+        # Term frequencies, duplicate (text, term) entries are summed
+        counts = sp.csr_matrix(
+            (np.ones(len(indices), dtype=np.float32), np.asarray(indices, dtype=np.int64), np.asarray(indptr, dtype=np.int64)),
+            shape=(len(texts), len(vocabulary))
+        )
+        counts.sum_duplicates()
+
+        lengths = np.diff(np.asarray(indptr))
+        average = lengths.mean() if len(lengths) and lengths.mean() > 0 else 1.0
+        frequency = np.bincount(counts.indices, minlength=len(vocabulary))
+        idf = np.log(1 + (len(texts) - frequency + 0.5) / (frequency + 0.5)).astype(np.float32)
+
+        tf = counts.data
+        norm = np.repeat(k1 * (1 - b + b * lengths / average), np.diff(counts.indptr)).astype(np.float32)
+        counts.data = idf[counts.indices] * tf * (k1 + 1) / (tf + norm)
+        return cls(vocabulary, counts, k1=k1, b=b)
+
+    def __len__(self):
+        return self.weights.shape[0]
+
+    def save(self, path):
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        sp.save_npz(path.with_suffix(".npz"), self.weights)
+        path.with_suffix(".json").write_text(json.dumps({"k1": self.k1, "b": self.b, "vocabulary": list(self.vocabulary)}))
+
+    @classmethod
+    def load(cls, path):
+        path = Path(path)
+        meta = json.loads(path.with_suffix(".json").read_text())
+        vocabulary = {term: column for column, term in enumerate(meta["vocabulary"])}
+        return cls(vocabulary, sp.load_npz(path.with_suffix(".npz")), k1=meta["k1"], b=meta["b"])
+
+    def scores(self, query):
+        """
+        BM25 score of every text for query.
+        """
+        terms, counts = np.unique(
+            [self.vocabulary[term] for term in tokenize(query) if term in self.vocabulary], return_counts=True
+        )
+        if not len(terms):
+            return np.zeros(len(self), dtype=np.float32)
+        return self.weights[:, terms] @ counts.astype(np.float32)
+
+    def search(self, query, k=10):
+        """
+        Returns scores and positions of the k best matching texts, best first, texts without any query term left out.
+        """
+        scores = self.scores(query)
+        candidates = np.flatnonzero(scores)
+        if len(candidates) > k:
+            candidates = candidates[np.argpartition(-scores[candidates], k - 1)[:k]]
+        order = candidates[np.argsort(-scores[candidates], kind="stable")]
+        return scores[order], order
+
+
+_bm25_indexes = Registry(MAX_BM25_INDEXES)
+
+
+def get_bm25_index(texts, directory=".bm25", fingerprint=None):
+    """
+    Returns the BM25Index of texts, loaded from or saved to directory (None to keep it in memory only)
+    and reused for the MAX_BM25_INDEXES most recently used corpora.
+
+    fingerprint is the corpus_fingerprint of texts if already known, it is computed otherwise.
+    """
+    key = fingerprint or corpus_fingerprint([text_hash(text) for text in texts])
+    # BM25Index.save writes the .json after the .npz, so an existing .json means a complete index
+    path = Path(directory) / f"{key[:16]}.json" if directory else None
+    return _bm25_indexes.get(key, lambda: BM25Index.build(texts), path=path, load=BM25Index.load)
+
+
+def reciprocal_rank_fusion(rankings, k=60):
+    """
+    Fuses ranked lists of positions, each position scoring sum(1 / (k + rank)) over the lists it appears in.
+    Returns {position: score}.
+    """
+    fused = {}
+    for ranking in rankings:
+        for rank, position in enumerate(ranking, 1):
+            fused[position] = fused.get(position, 0.0) + 1.0 / (k + rank)
+    return fused
+
+
+def weighted_fusion(score_lists, weights):
+    """
+    Fuses {position: score} dicts (higher is better), min-max normalizing each before weighting.
+    Positions missing from a list get 0 for it. Returns {position: score}.
+    """
+    fused = {}
+    for scores, weight in zip(score_lists, weights):
+        if not scores:
+            continue
+        values = np.fromiter(scores.values(), dtype=np.float64)
+        low, span = values.min(), values.max() - values.min()
+        for position, score in scores.items():
+            normalized = (score - low) / span if span else 1.0
+            fused[position] = fused.get(position, 0.0) + weight * normalized
+    return fused
@@ -0,0 +1,109 @@
+import re
+import numpy as np
+
+
+WORD_RE = re.compile(r"\S+")
+# Sections with at most max_tokens / SAFE_TOKENS_PER_WORD words are taken to fit without tokenizing them;
+# subword tokenizers rarely need more than two tokens per word of English text
+SAFE_TOKENS_PER_WORD = 2
+# Estimate for texts split without a tokenizer
+TOKENS_PER_WORD = 1.3
+
+
+def token_spans(text, tokenizer=None):
+    """
+    Character (start, end) of each token of text, words if no tokenizer is given.
+    """
+    if tokenizer is not None:
+        try:
+            return tokenizer(text, add_special_tokens=False, return_offsets_mapping=True, verbose=False)["offset_mapping"]
+        except NotImplementedError:
+            pass  # offsets need a fast tokenizer
+    return [match.span() for match in WORD_RE.finditer(text)]
+
+
+def chunk_text(text, max_tokens, overlap=32, tokenizer=None):
+    """
+    Splits text into windows of at most max_tokens tokens, consecutive windows sharing overlap tokens.
+
+    Returns the character (start, end) of each window. Without a tokenizer windows are counted in
+    words, assuming TOKENS_PER_WORD tokens per word.
+    """
+    assert 0 <= overlap < max_tokens, f"The chunk overlap ({overlap}) must be at least 0 and below max_tokens ({max_tokens})."
+    spans = token_spans(text, tokenizer)
+    if tokenizer is None:
+        max_tokens = max(1, int(max_tokens / TOKENS_PER_WORD))
+        overlap = min(int(overlap / TOKENS_PER_WORD), max_tokens - 1)
+    if len(spans) <= max_tokens:
+        return [(0, len(text))]
+
+    step = max_tokens - overlap
+    windows = []
+    for first in range(0, len(spans), step):
+        last = min(first + max_tokens, len(spans)) - 1
+        windows.append((spans[first][0], spans[last][1]))
+        if last == len(spans) - 1:
+            break
+    return windows
+
+
+def chunk_sections(texts, max_tokens, overlap=32, tokenizer=None, word_counts=None):
+    """
+    Splits long texts into overlapping chunks of at most max_tokens tokens.
+
+    Texts whose word count (given, e.g. the word_count column of section_df, or counted) shows they fit
+    are kept whole without tokenizing them.
+
+    Returns the chunk texts and, for each chunk, the position of the text it was cut from.
+    """
+    assert 0 <= overlap < max_tokens, f"The chunk overlap ({overlap}) must be at least 0 and below max_tokens ({max_tokens})."
+    chunks, owners = [], []
+    for position, text in enumerate(texts):
+        words = word_counts[position] if word_counts is not None else len(text.split())
+        if words * SAFE_TOKENS_PER_WORD <= max_tokens:
+            windows = [(0, len(text))]
+        else:
+            windows = chunk_text(text, max_tokens, overlap=overlap, tokenizer=tokenizer)
+        chunks.extend(text[start:end] for start, end in windows)
+        owners.extend([position] * len(windows))
+    return chunks, np.asarray(owners, dtype=np.int64)
+
+
+def encode_length_sorted(texts, encode, batch_size=64):
+    """
+    Encodes texts in batches of similar length, so little padding is computed, returning the vectors in input order.
+    """
+    order = sorted(range(len(texts)), key=lambda i: len(texts[i]), reverse=True)
+    vectors = None
+    for first in range(0, len(order), batch_size):
+        batch = order[first:first + batch_size]
+        encoded = np.asarray(encode([texts[i] for i in batch]))
+        if vectors is None:
+            vectors = np.empty((len(texts), encoded.shape[1]), dtype=encoded.dtype)
+        vectors[batch] = encoded
+    return vectors
+
+
+def aggregate_chunks(scores, indices, owners, k):
+    """
+    Turns chunk search results into section results: a section scores its best (smallest distance) chunk.
+
+    Args:
+        scores, indices(np.ndarray): Distances and chunk positions per query, -1 for missing results.
+        owners(np.ndarray): Section position of every chunk.
+        k(int): Number of sections to return per query.
+
+    Returns:
+        scores and section positions of shape (queries, k), padded with inf/-1.
+    """
+    section_scores = np.full((len(indices), k), np.inf, dtype=np.float32)
+    section_indices = np.full((len(indices), k), -1, dtype=np.int64)
+    for query, (chunk_scores, chunks) in enumerate(zip(scores, indices)):
+        found = chunks >= 0
+        sections = owners[chunks[found]]
+        # Results are ordered by distance, so the first occurrence of a section is its best chunk
+        _, first = np.unique(sections, return_index=True)
+        first = np.sort(first)[:k]
+        section_scores[query, :len(first)] = chunk_scores[found][first]
+        section_indices[query, :len(first)] = sections[first]
+    return section_scores, section_indices
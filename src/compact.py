@@ -0,0 +1,238 @@
+import sys
+import json
+import time
+import pickle
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+from pathlib import Path
+
+from .corpus import LIST_COLUMNS, LINK_COLUMNS
+
+
+COMPACT_VERSION = 1
+SECTION_COLUMNS = ["rfc", "number", "title", "word_count", "start", "end", "byte_start", "byte_end"]
+
+
+def utf8_offsets(text, offsets):
+    """
+    Converts character offsets into text to byte offsets into its UTF-8 encoding.
+    """
+    offsets = np.asarray(offsets, dtype=np.int64)
+    if text.isascii():
+        return offsets
+    code_points = np.frombuffer(text.encode("utf-32-le"), dtype=np.uint32)
+    widths = 1 + (code_points >= 0x80) + (code_points >= 0x800) + (code_points >= 0x10000)
+    return np.concatenate([[0], np.cumsum(widths)])[offsets]
+
+
+def frame_memory(dataframe):
+    """
+    Deep memory usage of a DataFrame in bytes, including the tuples inside list columns.
+    """
+    total = int(dataframe.memory_usage(deep=True).sum())
+    for column in dataframe.columns:
+        if dataframe[column].dtype == object:
+            for value in dataframe[column]:
+                if isinstance(value, list):
+                    total += sum(sys.getsizeof(item) for item in value)
+    return total
+
+
+class CompactCorpus:
+    """
+    Columnar form of rfc_df/section_df: the cleaned RFC texts are stored once in a contiguous UTF-8 buffer,
+    sections only keep their offsets into it and the updated_by/obsoleted_by lists become an edge table.
+
+    rfcs has one row per RFC with the metadata of rfc_df and the byte range of its text (text_start, text_end),
+    sections one row per section with its RFC, heading, character offsets (start, end) into the RFC text and
+    absolute byte offsets (byte_start, byte_end) into the buffer. edges has one row per link:
+    the section row, the kind (updated_by or obsoleted_by) and the linked (rfc, number).
+    """
+
+    def __init__(self, buffer, rfcs, sections, edges):
+        self.buffer = buffer
+        self.rfcs = rfcs
+        self.sections = sections
+        self.edges = edges
+        self._rfc_rows = {rfc: row for row, rfc in enumerate(rfcs["rfc_number"])}
+
+    @classmethod
+    def from_frames(cls, rfc_df, section_df):
+        encoded = [text.encode("utf-8") for text in rfc_df["text"]]
+        lengths = np.fromiter((len(data) for data in encoded), dtype=np.int64, count=len(encoded))
+        text_end = np.cumsum(lengths)
+        text_start = text_end - lengths
+
+        rfcs = rfc_df.drop(columns=["text"]).reset_index(drop=True)
+        rfcs["text_start"] = text_start
+        rfcs["text_end"] = text_end
+
+        sections = section_df[["rfc", "number", "title", "word_count", "start", "end"]].reset_index(drop=True)
+        byte_start = np.zeros(len(sections), dtype=np.int64)
+        byte_end = np.zeros(len(sections), dtype=np.int64)
+        rfc_rows = {rfc: row for row, rfc in enumerate(rfcs["rfc_number"])}
+        for rfc, positions in sections.groupby("rfc", sort=False).indices.items():
+            row = rfc_rows[rfc]
+            text = rfc_df["text"].iat[row]
+            byte_start[positions] = text_start[row] + utf8_offsets(text, sections["start"].to_numpy()[positions])
+            byte_end[positions] = text_start[row] + utf8_offsets(text, sections["end"].to_numpy()[positions])
+        sections["byte_start"] = byte_start
+        sections["byte_end"] = byte_end
+
+        edges = []
+        for kind in LINK_COLUMNS:
+            links = section_df[kind].reset_index(drop=True).explode().dropna()
+            edges.append(pd.DataFrame({
+                "section": links.index.to_numpy(dtype=np.int64),
+                "kind": kind,
+                "rfc": [int(rfc) for rfc, _ in links],
+                "number": [number for _, number in links],
+            }))
+        edges = pd.concat(edges, ignore_index=True)
+        edges["kind"] = pd.Categorical(edges["kind"], categories=LINK_COLUMNS)
+        # Links of a section keep their original order
+        edges = edges.sort_values(["section", "kind"], kind="stable", ignore_index=True)
+
+        buffer = np.frombuffer(b"".join(encoded), dtype=np.uint8)
+        return cls(buffer, rfcs, sections, edges)
+
+    def __len__(self):
+        return len(self.sections)
+
+    def text(self, rfc):
+        row = self._rfc_rows[rfc]
+        return self._decode(self.rfcs["text_start"].iat[row], self.rfcs["text_end"].iat[row])
+
+    def content(self, position):
+        return self._decode(self.sections["byte_start"].iat[position], self.sections["byte_end"].iat[position])
+
+    def _decode(self, start, end):
+        return self.buffer[start:end].tobytes().decode("utf-8")
+
+    def links(self, kind):
+        """
+        Returns the kind (updated_by or obsoleted_by) links of every section as lists of (rfc, number) tuples.
+        """
+        result = [[] for _ in range(len(self.sections))]
+        edges = self.edges[self.edges["kind"] == kind]
+        for section, rfc, number in zip(edges["section"], edges["rfc"], edges["number"]):
+            result[section].append((int(rfc), number))
+        return result
+
+    def rfc_frame(self, text=True):
+        """
+        rfc_df as built by setup_rfc_datasets, text=False leaves out the RFC texts.
+        """
+        rfc_df = self.rfcs.drop(columns=["text_start", "text_end"])
+        if text:
+            rfc_df.insert(
+                list(rfc_df.columns).index("content_hash") if "content_hash" in rfc_df else len(rfc_df.columns),
+                "text",
+                [self._decode(start, end) for start, end in zip(self.rfcs["text_start"], self.rfcs["text_end"])]
+            )
+        return rfc_df
+
+    def section_frame(self, content=True, links=True):
+        """
+        section_df as built by setup_rfc_datasets, e.g. for search_sections.
+
+        content is an Arrow large_string column holding the section texts in one buffer copied from the corpus
+        buffer, not one Python string per section. content=False and links=False leave out the content and
+        updated_by/obsoleted_by columns when they are not needed.
+        """
+        section_df = self.sections[["number", "title"]].copy()
+        if content:
+            section_df["content"] = pd.Series(self._content_array(), index=section_df.index)
+        for column in ["word_count", "start", "end", "rfc"]:
+            section_df[column] = self.sections[column]
+        if links:
+            for kind in LINK_COLUMNS:
+                section_df[kind] = self.links(kind)
+        return section_df
+
+    def _content_array(self):
+        starts = self.sections["byte_start"].to_numpy(dtype=np.int64)
+        ends = self.sections["byte_end"].to_numpy(dtype=np.int64)
+        offsets = np.zeros(len(starts) + 1, dtype=np.int64)
+        np.cumsum(ends - starts, out=offsets[1:])
+        data = np.concatenate([np.asarray(self.buffer[start:end]) for start, end in zip(starts, ends)]) if len(starts) else np.zeros(0, dtype=np.uint8)
+        array = pa.LargeStringArray.from_buffers(len(starts), pa.py_buffer(offsets), pa.py_buffer(data))
+        return pd.arrays.ArrowExtensionArray(array)
+
+    def save(self, directory):
+        directory = Path(directory)
+        directory.mkdir(parents=True, exist_ok=True)
+        self.buffer.tofile(directory / "text.bin")
+        self.rfcs.to_parquet(directory / "rfcs.parquet", index=False)
+        self.sections.to_parquet(directory / "sections.parquet", index=False)
+        self.edges.to_parquet(directory / "edges.parquet", index=False)
+        (directory / "meta.json").write_text(json.dumps({"version": COMPACT_VERSION, "bytes": int(len(self.buffer))}))
+
+    @classmethod
+    def load(cls, directory, mmap=True):
+        """
+        Loads a saved corpus, by default memory-mapping the text buffer instead of reading it.
+        """
+        directory = Path(directory)
+        meta = json.loads((directory / "meta.json").read_text())
+        assert meta["version"] == COMPACT_VERSION, f"Unsupported compact corpus version {meta['version']}."
+
+        if not meta["bytes"]:
+            buffer = np.zeros(0, dtype=np.uint8)
+        elif mmap:
+            buffer = np.memmap(directory / "text.bin", dtype=np.uint8, mode="r")
+        else:
+            buffer = np.fromfile(directory / "text.bin", dtype=np.uint8)
+
+        rfcs = pd.read_parquet(directory / "rfcs.parquet")
+        for column in LIST_COLUMNS:
+            if column in rfcs:
+                rfcs[column] = rfcs[column].map(lambda values: values.tolist())
+        edges = pd.read_parquet(directory / "edges.parquet")
+        edges["kind"] = pd.Categorical(edges["kind"], categories=LINK_COLUMNS)
+        return cls(buffer, rfcs, pd.read_parquet(directory / "sections.parquet"), edges)
+
+    def memory_usage(self):
+        """
+        Bytes held by the buffer and the three tables.
+        """
+        return {
+            "buffer": int(self.buffer.nbytes),
+            "rfcs": frame_memory(self.rfcs),
+            "sections": frame_memory(self.sections),
+            "edges": frame_memory(self.edges),
+        }
+
+
+def memory_report(rfc_df, section_df, corpus=None):
+    """
+    Compares memory use and pickling of rfc_df/section_df with their CompactCorpus.
+
+    Returns a dict with the bytes of both forms, the bytes saved and the pickled size and time of each.
+    """
+    corpus = corpus if corpus is not None else CompactCorpus.from_frames(rfc_df, section_df)
+
+    def pickled(value):
+        start = time.perf_counter()
+        size = len(pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL))
+        return size, time.perf_counter() - start
+
+    frames_bytes = frame_memory(rfc_df) + frame_memory(section_df)
+    compact_bytes = sum(corpus.memory_usage().values())
+    frames_pickle, frames_pickle_s = pickled((rfc_df, section_df))
+    compact_pickle, compact_pickle_s = pickled((corpus.buffer.tobytes(), corpus.rfcs, corpus.sections, corpus.edges))
+
+    return {
+        "rfcs": len(rfc_df),
+        "sections": len(section_df),
+        "dataframe_bytes": frames_bytes,
+        "compact_bytes": compact_bytes,
+        "saved_bytes": frames_bytes - compact_bytes,
+        "ratio": compact_bytes / frames_bytes if frames_bytes else None,
+        "dataframe_pickle_bytes": frames_pickle,
+        "compact_pickle_bytes": compact_pickle,
+        "dataframe_pickle_s": frames_pickle_s,
+        "compact_pickle_s": compact_pickle_s,
+    }
@@ -0,0 +1,75 @@
+import json
+import pandas as pd
+
+from pathlib import Path
+
+from .graph import RFCGraph
+
+
+# Bump whenever parsing changes in a way that invalidates previously stored rows
+STORE_VERSION = 2
+
+LIST_COLUMNS = ["obsoletes", "updates", "authors"]
+LINK_COLUMNS = ["updated_by", "obsoleted_by"]
+
+
+def _links_to_records(links):
+    return [{"rfc": int(rfc), "number": number} for rfc, number in links]
+
+
+def _records_to_links(records):
+    return [(int(record["rfc"]), record["number"]) for record in records]
+
+
+class CorpusStore:
+    """
+    Persists rfc_df/section_df as Parquet files so that later builds only re-parse changed RFCs.
+
+    Each row of rfc_df carries the content_hash of the downloaded text it was parsed from.
+    """
+
+    def __init__(self, directory="corpus"):
+        self.directory = Path(directory)
+        self.rfc_file = self.directory / "rfcs.parquet"
+        self.section_file = self.directory / "sections.parquet"
+        self.meta_file = self.directory / "meta.json"
+        self.graph_file = self.directory / "graph.npz"
+
+    def exists(self):
+        if not (self.rfc_file.exists() and self.section_file.exists() and self.meta_file.exists()):
+            return False
+        return json.loads(self.meta_file.read_text()).get("version") == STORE_VERSION
+
+    def load(self):
+        if not self.exists():
+            return None, None
+
+        rfc_df = pd.read_parquet(self.rfc_file)
+        for column in LIST_COLUMNS:
+            rfc_df[column] = rfc_df[column].map(lambda values: values.tolist())
+
+        section_df = pd.read_parquet(self.section_file)
+        for column in LINK_COLUMNS:
+            section_df[column] = section_df[column].map(_records_to_links)
+
+        return rfc_df, section_df
+
+    def load_graph(self):
+        """
+        Returns the RFCGraph of the stored corpus, built on every save.
+        """
+        if not self.exists() or not self.graph_file.exists():
+            return None
+        return RFCGraph.load(self.graph_file)
+
+    def save(self, rfc_df, section_df):
+        self.directory.mkdir(parents=True, exist_ok=True)
+        RFCGraph.from_frames(rfc_df, section_df).save(self.graph_file)
+
+        section_df = section_df.copy()
+        for column in LINK_COLUMNS:
+            section_df[column] = section_df[column].map(_links_to_records)
+
+        rfc_df.to_parquet(self.rfc_file, index=False)
+        section_df.to_parquet(self.section_file, index=False)
+        self.meta_file.write_text(json.dumps({"version": STORE_VERSION}))
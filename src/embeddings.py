@@ -0,0 +1,75 @@
+import json
+import numpy as np
+
+from pathlib import Path
+
+from .registry import text_hash
+
+
+class EmbeddingStore:
+    """
+    Persistent embeddings of one encoder, keyed by the hash of the embedded text.
+
+    Vectors are appended to a float32 file that is memory-mapped for reading,
+    ids.json lists the text hash of each row.
+    """
+
+    def __init__(self, encoder_name, directory=".embeddings"):
+        self.directory = Path(directory) / encoder_name.replace("/", "__")
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.vector_file = self.directory / "vectors.f32"
+        self.id_file = self.directory / "ids.json"
+
+        self.dimension = None
+        self.rows = {}
+        if self.id_file.exists():
+            sidecar = json.loads(self.id_file.read_text())
+            self.dimension = sidecar["dimension"]
+            self.rows = {digest: row for row, digest in enumerate(sidecar["ids"])}
+
+    def __len__(self):
+        return len(self.rows)
+
+    def __contains__(self, digest):
+        return digest in self.rows
+
+    def vectors(self):
+        if not self.rows:
+            return np.empty((0, self.dimension or 0), dtype=np.float32)
+        return np.memmap(self.vector_file, dtype=np.float32, mode="r", shape=(len(self.rows), self.dimension))
+
+    def add(self, hashes, vectors):
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        if self.dimension is None:
+            self.dimension = vectors.shape[1]
+        assert vectors.shape[1] == self.dimension, "Embedding dimension differs from the stored vectors."
+
+        # Drop vectors of an interrupted append that never made it into the id table
+        with open(self.vector_file, "ab") as file:
+            file.truncate(len(self.rows) * self.dimension * 4)
+            file.write(vectors.tobytes())
+
+        for digest in hashes:
+            self.rows[digest] = len(self.rows)
+
+        tmp = self.id_file.with_suffix(".tmp")
+        tmp.write_text(json.dumps({"dimension": self.dimension, "ids": list(self.rows)}))
+        tmp.replace(self.id_file)
+
+    def get(self, hashes):
+        return np.asarray(self.vectors()[[self.rows[digest] for digest in hashes]])
+
+    def encode(self, texts, encode, hashes=None):
+        """
+        Returns the embeddings of texts, calling encode(list of texts) only for texts that are not stored yet.
+        """
+        hashes = hashes if hashes is not None else [text_hash(text) for text in texts]
+
+        missing = {}
+        for digest, text in zip(hashes, texts):
+            if digest not in self.rows and digest not in missing:
+                missing[digest] = text
+        if missing:
+            self.add(list(missing), encode(list(missing.values())))
+
+        return self.get(hashes)
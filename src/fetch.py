@@ -0,0 +1,188 @@
+import json
+import logging
+import requests
+import threading
+
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from . import metrics
+from .registry import text_hash
+
+
+logger = logging.getLogger(__name__)
+
+RFC_URL = "https://www.ietf.org/rfc/rfc{rfc}.txt"
+
+
+def create_session(pool_size=16, retries=3):
+    """
+    Creates a requests session whose connection pool is large enough for concurrent downloads.
+    """
+    session = requests.Session()
+    adapter = HTTPAdapter(
+        pool_connections=pool_size,
+        pool_maxsize=pool_size,
+        max_retries=Retry(total=retries, backoff_factor=0.5, status_forcelist=[429, 500, 502, 503, 504])
+    )
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+class RFCCache:
+    """
+    Content-addressed on-disk cache of RFC texts.
+
+    Texts are stored under objects/ by their SHA-256, index.json maps each RFC number
+    to its current object and the ETag/Last-Modified headers used for revalidation.
+    """
+
+    def __init__(self, directory=".rfc_cache"):
+        self.directory = Path(directory)
+        self.objects = self.directory / "objects"
+        self.objects.mkdir(parents=True, exist_ok=True)
+        self.index_file = self.directory / "index.json"
+        self.index = json.loads(self.index_file.read_text()) if self.index_file.exists() else {}
+        self._lock = threading.Lock()
+
+    def _object_path(self, digest):
+        return self.objects / digest[:2] / digest
+
+    def lookup(self, rfc):
+        with self._lock:
+            return self.index.get(str(rfc))
+
+    def read(self, rfc):
+        entry = self.lookup(rfc)
+        if entry is None:
+            return None
+        path = self._object_path(entry["sha256"])
+        if not path.exists():
+            return None
+        return path.read_text(encoding="utf-8")
+
+    def write(self, rfc, text, etag=None, last_modified=None):
+        digest = text_hash(text)
+        path = self._object_path(digest)
+        if not path.exists():
+            path.parent.mkdir(exist_ok=True)
+            tmp = path.with_suffix(f".{threading.get_ident()}.tmp")
+            tmp.write_text(text, encoding="utf-8")
+            tmp.replace(path)
+
+        with self._lock:
+            self.index[str(rfc)] = {"sha256": digest, "etag": etag, "last_modified": last_modified}
+        return digest
+
+    def save(self):
+        with self._lock:
+            tmp = self.index_file.with_suffix(".tmp")
+            tmp.write_text(json.dumps(self.index, indent=1))
+            tmp.replace(self.index_file)
+
+
+def fetch_rfc_text(rfc, session=None, cache=None, mirror_dir=None, offline=False, timeout=30):
+    """
+    Fetches the text of a single RFC, preferring the local mirror, then the (revalidated) cache.
+
+    Raises FileNotFoundError if the RFC is not published, or offline, neither mirrored nor cached.
+    """
+    if mirror_dir is not None:
+        path = Path(mirror_dir) / f"rfc{rfc}.txt"
+        if path.exists():
+            metrics.count("fetch.mirror_reads")
+            return path.read_text(encoding="utf-8", errors="replace")
+
+    entry = cache.lookup(rfc) if cache is not None else None
+    cached = cache.read(rfc) if entry is not None else None
+
+    if offline:
+        if cached is None:
+            raise FileNotFoundError(f"RFC {rfc} is neither mirrored nor cached and offline mode is enabled.")
+        metrics.count("fetch.cache.hits")
+        return cached
+
+    headers = {}
+    if cached is not None:
+        if entry.get("etag"):
+            headers["If-None-Match"] = entry["etag"]
+        if entry.get("last_modified"):
+            headers["If-Modified-Since"] = entry["last_modified"]
+
+    with metrics.timer("fetch.request"):
+        response = (session or requests).get(RFC_URL.format(rfc=rfc), headers=headers, timeout=timeout)
+    if response.status_code == 304 and cached is not None:
+        metrics.count("fetch.cache.hits")
+        return cached
+    if response.status_code in (404, 410):
+        raise FileNotFoundError(f"RFC {rfc} is not published at {response.url} (HTTP {response.status_code}).")
+    response.raise_for_status()
+
+    text = response.text
+    metrics.count("fetch.cache.misses")
+    metrics.count("fetch.bytes", len(response.content))
+    if cache is not None:
+        cache.write(rfc, text, response.headers.get("ETag"), response.headers.get("Last-Modified"))
+    return text
+
+
+def fetch_rfc_texts(
+        rfc_ids,
+        cache_dir=".rfc_cache",
+        mirror_dir=None,
+        offline=False,
+        max_workers=16,
+        session=None,
+        timeout=30,
+        missing="raise"
+):
+    """
+    Downloads many RFCs concurrently over a pooled session.
+
+    Args:
+        rfc_ids(List[int]): RFC numbers to fetch.
+        cache_dir(str, optional): Directory of the on-disk cache, None disables caching.
+        mirror_dir(str, optional): Local directory with rfc<N>.txt files that takes precedence over the network.
+        offline(bool, optional): Never touch the network, only use the mirror and the cache.
+        max_workers(int, optional): Number of concurrent downloads.
+        session(requests.Session, optional): Session to reuse, a pooled one is created otherwise.
+        timeout(float, optional): Timeout per request in seconds.
+        missing(str, optional): What to do about RFCs without a text (not published, or offline neither
+            mirrored nor cached): "raise" a FileNotFoundError, or "skip" them, logging their numbers.
+
+    Returns:
+        List of RFC texts in the order of rfc_ids, None for the RFCs skipped as missing.
+    """
+    assert missing in ("raise", "skip"), f"Unknown missing policy {missing!r}, expected 'raise' or 'skip'."
+    cache = RFCCache(cache_dir) if cache_dir is not None else None
+
+    def fetch(rfc):
+        try:
+            return fetch_rfc_text(rfc, session, cache, mirror_dir, offline, timeout)
+        except FileNotFoundError:
+            if missing == "raise":
+                raise
+            return None
+
+    own_session = session is None
+    if own_session:
+        session = create_session(pool_size=max_workers)
+
+    unique_ids = list(dict.fromkeys(rfc_ids))
+    try:
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            texts = dict(zip(unique_ids, executor.map(fetch, unique_ids)))
+    finally:
+        if cache is not None:
+            cache.save()
+        if own_session:
+            session.close()
+
+    skipped = [rfc for rfc in unique_ids if texts[rfc] is None]
+    if skipped:
+        metrics.count("fetch.missing", len(skipped))
+        logger.warning("Skipped %d RFCs without a text: %s", len(skipped), ", ".join(map(str, skipped)))
+    return [texts[rfc] for rfc in rfc_ids]
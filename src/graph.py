@@ -0,0 +1,223 @@
+import re
+import numpy as np
+
+from pathlib import Path
+from collections import deque
+
+from .templates import REGEXES
+
+
+# Relations stored as CSR adjacency; each one has its reverse, e.g. A updates B <=> B updated_by A
+RFC_RELATIONS = ["updates", "updated_by", "obsoletes", "obsoleted_by", "cites", "cited_by"]
+SECTION_RELATIONS = ["section_updates", "section_updated_by", "section_obsoletes", "section_obsoleted_by"]
+CITATION_RELATIONS = ["section_cites", "cited_by_sections"]  # section -> RFC, RFC -> section
+
+
+def build_csr(sources, targets, size):
+    """
+    Returns (indptr, indices) of the deduplicated edges source -> target between nodes 0..size-1,
+    neighbours sorted in ascending order.
+    """
+    edges = np.unique(np.stack([np.asarray(sources, dtype=np.int64), np.asarray(targets, dtype=np.int64)], axis=1).reshape(-1, 2), axis=0)
+    indptr = np.zeros(size + 1, dtype=np.int64)
+    np.cumsum(np.bincount(edges[:, 0], minlength=size), out=indptr[1:])
+    return indptr, edges[:, 1].copy()
+
+
+class RFCGraph:
+    """
+    Dependency graph of a corpus built from rfc_df/section_df.
+
+    RFC nodes are linked by the updates/obsoletes headers and by [NNNN] citations in their sections,
+    section nodes by the updated_by/obsoleted_by links of the linker. Sections are numbered by their
+    row in section_df. All relations are kept as CSR adjacency arrays in both directions.
+    """
+
+    def __init__(self, rfc_numbers, section_rfcs, section_numbers, adjacency):
+        self.rfc_numbers = rfc_numbers
+        self.section_rfcs = section_rfcs
+        self.section_numbers = section_numbers
+        self.adjacency = adjacency
+
+        self._rfc_nodes = {rfc: node for node, rfc in enumerate(rfc_numbers.tolist())}
+        self._section_nodes = {}
+        for node, key in enumerate(zip(section_rfcs.tolist(), section_numbers.tolist())):
+            self._section_nodes.setdefault(key, node)
+
+        # In-degrees and the nodes ranked by them, for most_referenced_sections/most_cited_rfcs
+        self.section_references = (
+            np.diff(self.adjacency["section_updated_by"][0]) + np.diff(self.adjacency["section_obsoleted_by"][0])
+        )
+        self.rfc_citations = np.diff(self.adjacency["cited_by_sections"][0])
+        self._section_ranking = np.argsort(-self.section_references, kind="stable")
+        self._rfc_ranking = np.argsort(-self.rfc_citations, kind="stable")
+
+    @classmethod
+    def from_frames(cls, rfc_df, section_df, reference_regex=REGEXES["RFC_REFERENCES"]):
+        section_rfcs = section_df["rfc"].to_numpy(dtype=np.int64)
+        section_numbers = section_df["number"].to_numpy(dtype=str)
+
+        pattern = re.compile(reference_regex)
+        citations = [
+            [int(match.strip("[]")) for match in pattern.findall(content)]
+            for content in section_df["content"].fillna("")
+        ]
+
+        rfc_numbers = set(rfc_df["rfc_number"].tolist()) | set(section_rfcs.tolist())
+        for column in ["updates", "obsoletes"]:
+            for related in rfc_df[column]:
+                rfc_numbers.update(related)
+        for cited in citations:
+            rfc_numbers.update(cited)
+        rfc_numbers = np.array(sorted(rfc_numbers), dtype=np.int64)
+        rfc_node = {rfc: node for node, rfc in enumerate(rfc_numbers.tolist())}
+        num_rfcs, num_sections = len(rfc_numbers), len(section_df)
+
+        adjacency = {}
+
+        # RFC headers
+        for relation, reverse, column in [("updates", "updated_by", "updates"), ("obsoletes", "obsoleted_by", "obsoletes")]:
+            sources, targets = [], []
+            for rfc, related in zip(rfc_df["rfc_number"].tolist(), rfc_df[column]):
+                for other in related:
+                    sources.append(rfc_node[rfc])
+                    targets.append(rfc_node[other])
+            adjacency[relation] = build_csr(sources, targets, num_rfcs)
+            adjacency[reverse] = build_csr(targets, sources, num_rfcs)
+
+        # Citations, self-citations are left out
+        sections, cited = [], []
+        for node, (rfc, cited_rfcs) in enumerate(zip(section_rfcs.tolist(), citations)):
+            for other in cited_rfcs:
+                if other != rfc:
+                    sections.append(node)
+                    cited.append(rfc_node[other])
+        cited = np.asarray(cited, dtype=np.int64)
+        citing = np.asarray([rfc_node[rfc] for rfc in section_rfcs[sections].tolist()], dtype=np.int64)
+        adjacency["section_cites"] = build_csr(sections, cited, num_sections)
+        adjacency["cited_by_sections"] = build_csr(cited, sections, num_rfcs)
+        adjacency["cites"] = build_csr(citing, cited, num_rfcs)
+        adjacency["cited_by"] = build_csr(cited, citing, num_rfcs)
+
+        # Linker results, (rfc, number) tuples resolved to section nodes
+        section_node = {}
+        for node, key in enumerate(zip(section_rfcs.tolist(), section_numbers.tolist())):
+            section_node.setdefault(key, node)
+        for relation, reverse, column in [
+            ("section_updated_by", "section_updates", "updated_by"),
+            ("section_obsoleted_by", "section_obsoletes", "obsoleted_by")
+        ]:
+            sources, targets = [], []
+            for node, links in enumerate(section_df[column]):
+                for rfc, number in links:
+                    if (rfc, number) in section_node:
+                        sources.append(node)
+                        targets.append(section_node[(rfc, number)])
+            adjacency[relation] = build_csr(sources, targets, num_sections)
+            adjacency[reverse] = build_csr(targets, sources, num_sections)
+
+        return cls(rfc_numbers, section_rfcs, section_numbers, adjacency)
+
+    def save(self, path):
+        arrays = {"rfc_numbers": self.rfc_numbers, "section_rfcs": self.section_rfcs, "section_numbers": self.section_numbers}
+        for relation, (indptr, indices) in self.adjacency.items():
+            arrays[f"{relation}.indptr"] = indptr
+            arrays[f"{relation}.indices"] = indices
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        with open(path, "wb") as file:
+            np.savez(file, **arrays)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            adjacency = {
+                relation: (data[f"{relation}.indptr"], data[f"{relation}.indices"])
+                for relation in RFC_RELATIONS + SECTION_RELATIONS + CITATION_RELATIONS
+            }
+            return cls(data["rfc_numbers"], data["section_rfcs"], data["section_numbers"], adjacency)
+
+    def _neighbors(self, relation, node):
+        indptr, indices = self.adjacency[relation]
+        return indices[indptr[node]:indptr[node + 1]]
+
+    def _reachable(self, relation, start):
+        # Breadth-first, nearest nodes first, start itself excluded
+        seen, order, queue = {start}, [], deque([start])
+        while queue:
+            for node in self._neighbors(relation, queue.popleft()).tolist():
+                if node not in seen:
+                    seen.add(node)
+                    order.append(node)
+                    queue.append(node)
+        return order
+
+    def section(self, rfc, number):
+        """
+        Row of the section in section_df, KeyError if it is not in the corpus.
+        """
+        return self._section_nodes[(rfc, number)]
+
+    def section_key(self, node):
+        return int(self.section_rfcs[node]), str(self.section_numbers[node])
+
+    def related(self, rfc, relation="updated_by", transitive=True):
+        """
+        RFC numbers related to rfc, e.g. relation="updated_by" gives the RFCs updating it and, with transitive,
+        the RFCs updating those, nearest first. See RFC_RELATIONS.
+        """
+        assert relation in RFC_RELATIONS, f"Unknown relation {relation}, expected one of {RFC_RELATIONS}."
+        if rfc not in self._rfc_nodes:
+            return []
+        node = self._rfc_nodes[rfc]
+        nodes = self._reachable(relation, node) if transitive else self._neighbors(relation, node).tolist()
+        return self.rfc_numbers[nodes].tolist()
+
+    def updaters(self, rfc, transitive=True):
+        return self.related(rfc, "updated_by", transitive=transitive)
+
+    def citing_sections(self, rfc):
+        """
+        (rfc, number) of every section citing rfc.
+        """
+        if rfc not in self._rfc_nodes:
+            return []
+        return [self.section_key(node) for node in self._neighbors("cited_by_sections", self._rfc_nodes[rfc]).tolist()]
+
+    def section_links(self, rfc, number, relation="section_updated_by", transitive=True):
+        """
+        (rfc, number) of the sections related to a section, see SECTION_RELATIONS.
+        """
+        assert relation in SECTION_RELATIONS, f"Unknown relation {relation}, expected one of {SECTION_RELATIONS}."
+        node = self.section(rfc, number)
+        nodes = self._reachable(relation, node) if transitive else self._neighbors(relation, node).tolist()
+        return [self.section_key(other) for other in nodes]
+
+    def effective_version(self, rfc, number):
+        """
+        Current version of a section: follows obsoleted_by links to the newest section replacing it.
+
+        Returns (rfc, number) of that section, the section itself if it was never obsoleted, and the sections
+        updating the effective version.
+        """
+        node, seen = self.section(rfc, number), set()
+        while node not in seen:
+            seen.add(node)
+            replacements = self._neighbors("section_obsoleted_by", node)
+            if not len(replacements):
+                break
+            node = int(replacements[np.argmax(self.section_rfcs[replacements])])
+
+        updaters = self._neighbors("section_updated_by", node).tolist()
+        return self.section_key(node), [self.section_key(other) for other in updaters]
+
+    def most_referenced_sections(self, k=10):
+        """
+        The k sections updated or obsoleted by the most sections, as ((rfc, number), count) pairs.
+        """
+        return [(self.section_key(node), int(self.section_references[node])) for node in self._section_ranking[:k].tolist()]
+
+    def most_cited_rfcs(self, k=10):
+        """
+        The k RFCs cited by the most sections of other RFCs, as (rfc, count) pairs.
+        """
+        return [(int(self.rfc_numbers[node]), int(self.rfc_citations[node])) for node in self._rfc_ranking[:k].tolist()]
@@ -1,12 +1,26 @@
+import json
 import torch
 import numpy as np
 
 import pandas as pd
-from pathlib import Path
-from tqdm import tqdm
+from functools import lru_cache
 from datasets import Dataset
 from sentence_transformers import SentenceTransformer
 
+from . import metrics
+from .ann import SEARCH_PARAMS, config_name, index_config, load_config, save_config, set_search_params, train_index
+from .chunking import aggregate_chunks, chunk_sections, encode_length_sorted
+from .embeddings import EmbeddingStore
+from .registry import Registry, corpus_fingerprint, text_hash
+
+
+MAX_INDEXES = 4  # number of HFSTIndex instances kept loaded by get_index
+
+
+@lru_cache(maxsize=4)
+def load_encoder(name, device):
+    return SentenceTransformer(name).to(device)
+
 
 class HFSTIndex:
     def __init__(
@@ -17,9 +31,16 @@ class HFSTIndex:
         index_src_col="descriptions",  # text col name on which index to create
         index_col_name="embeddings",  # col name for index embeddings
         overwrite_existing=False,  # set True to force rebuilding of index
+        cache_dir=".embeddings",  # directory of the embedding store and faiss files
+        batch_size=64,  # encoder batch size for texts missing from the embedding store
+        index_type="flat",  # faiss index type: flat, ivf_flat, hnsw or ivf_pq
+        index_params=None,  # index parameters, e.g. nlist/nprobe for IVF or M/efSearch for HNSW, see ann.DEFAULT_PARAMS
+        chunk_tokens=None,  # split texts longer than this many tokens, defaults to the encoder's max sequence length
+        chunk_overlap=None,  # tokens shared by consecutive chunks, defaults to 32 or a quarter of chunk_tokens if less
     ):
 
-        self.dataset = Dataset.from_pandas(dataframe)
+        self.dataframe = dataframe
+        self.batch_size = batch_size
 
         self.index_encoder = None
         self.query_encoder = None
@@ -29,66 +50,139 @@ class HFSTIndex:
         self.index_src_col = index_src_col
         self.index_col_name = index_col_name
 
+        # Texts beyond the encoder's max sequence length would be truncated, so they are indexed as overlapping
+        # chunks and a row scores its best chunk; only the chunks go into the dataset
+        max_seq_length = getattr(self.index_encoder, "max_seq_length", None)
+        self.chunk_tokens = chunk_tokens or (max_seq_length - 2 if max_seq_length else None)  # room for special tokens
+        texts = dataframe[index_src_col].tolist()
+        if self.chunk_tokens:
+            word_counts = dataframe["word_count"].tolist() if index_src_col == "content" and "word_count" in dataframe else None
+            self.texts, self.owners = chunk_sections(
+                texts,
+                self.chunk_tokens,
+                overlap=chunk_overlap if chunk_overlap is not None else min(32, self.chunk_tokens // 4),
+                tokenizer=getattr(self.index_encoder, "tokenizer", None),
+                word_counts=word_counts
+            )
+        else:
+            self.texts, self.owners = texts, np.arange(len(texts))
+        self.chunked = len(self.texts) != len(texts)
+        self.dataset = Dataset.from_dict({index_src_col: self.texts})
+        self.hashes = [text_hash(text) for text in self.texts]
+        self.store = EmbeddingStore(index_encoder, cache_dir)
+
+        self.index_config = index_config(index_type, **(index_params or {}))
+
         self.faiss_file = self._create_filename(index_encoder)
         if overwrite_existing:
             self.faiss_file.unlink(missing_ok=True)
+            self.faiss_file.with_suffix(".json").unlink(missing_ok=True)
 
-        if self.faiss_file.exists():
-            print("Loading existing faiss index...")
-            self.dataset.load_faiss_index(
-                index_name=self.index_col_name,
-                file=self.faiss_file,
-            )
-            print("Faiss index loaded.")
-        else:
-            self._create_faiss_index()
+        self._create_faiss_index()
 
     def _load_encoders(self, index_encoder, query_encoder):
         print("Loading encoders...")
-        self.index_encoder = SentenceTransformer(index_encoder).to(self.device)
+        self.index_encoder = load_encoder(index_encoder, self.device)
         self.query_encoder = self.index_encoder
         if query_encoder is not None and query_encoder != index_encoder:
-            self.query_encoder = SentenceTransformer(query_encoder).to(self.device)
+            self.query_encoder = load_encoder(query_encoder, self.device)
         print("Encoders loaded.")
 
     def _create_filename(self, index_encoder):
-        faiss_file = f"{index_encoder}.faiss"
-        return Path(faiss_file)
+        # Keyed by the embedded texts and the index configuration, so an unchanged corpus reuses its index
+        faiss_file = f"{corpus_fingerprint(self.hashes)[:16]}-{config_name(self.index_config)}.faiss"
+        return self.store.directory / faiss_file
 
-    def _create_faiss_index(self):
-        def create_embeddings(ex):
-            encoded = self.index_encoder.encode(ex[self.index_src_col])
-            return {self.index_col_name: encoded}
+    def _encode_batch(self, batch):
+        with metrics.timer("embedding.encode_batch"):
+            return self.index_encoder.encode(batch, batch_size=self.batch_size)
 
+    def _encode(self, texts):
+        metrics.count("embedding.texts_encoded", len(texts))
+        with torch.no_grad():
+            return encode_length_sorted(texts, self._encode_batch, batch_size=self.batch_size)
+
+    def _create_faiss_index(self):
         if not self.faiss_file.exists():
-            with torch.no_grad():
-                print("Creating embeddings...")
-                data = self.dataset.map(create_embeddings)
-                print("Creating faiss index...")
-                data.add_faiss_index(column=self.index_col_name)
-                print("Saving faiss index to disk...")
-                data.save_faiss_index(
+            missing = len(set(self.hashes) - set(self.store.rows))
+            metrics.count("embedding.cache.hits", len(set(self.hashes)) - missing)
+            metrics.count("embedding.cache.misses", missing)
+            print(f"Creating embeddings ({missing} not cached)...")
+            with metrics.timer("embedding.encode"):
+                embeddings = self.store.encode(self.texts, self._encode, hashes=self.hashes)
+            print(f"Creating faiss index ({self.index_config['index_type']})...")
+            with metrics.timer("faiss.build", index_type=self.index_config["index_type"]):
+                self.dataset.add_faiss_index_from_external_arrays(
+                    external_arrays=embeddings,
+                    index_name=self.index_col_name,
+                    custom_index=train_index(embeddings, self.index_config),
+                )
+            print("Saving faiss index to disk...")
+            self.dataset.save_faiss_index(
+                index_name=self.index_col_name,
+                file=self.faiss_file,
+            )
+            save_config(self.index_config, self.faiss_file)
+            print("Faiss index saved.")
+        else:
+            print("Loading faiss index...")
+            with metrics.timer("faiss.load"):
+                self.dataset.load_faiss_index(
                     index_name=self.index_col_name,
                     file=self.faiss_file,
                 )
-                print("Faiss index saved.")
+            # Build parameters as stored (e.g. a reduced nlist), search parameters as requested
+            stored_config = load_config(self.faiss_file) or {}
+            self.index_config = {**self.index_config, **stored_config, **{
+                key: value for key, value in self.index_config.items() if key in SEARCH_PARAMS
+            }}
+            print("Faiss index loaded.")
 
-        print("Loading faiss index...")
-        self.dataset.load_faiss_index(
-            index_name=self.index_col_name,
-            file=self.faiss_file,
-        )
-        print("Faiss index loaded.")
+        set_search_params(self.dataset.get_index(self.index_col_name).faiss_index, self.index_config)
 
-    def semantic_search(self, queries, k=10):
-        with torch.no_grad():
-            queries = self.query_encoder.encode(queries)
+    def search(self, queries, k=10, batch_size=None):
+        """
+        Returns scores and row positions (-1 if fewer than k rows) of the k nearest rows for each query.
+
+        All queries are encoded together, batch_size defaults to the batch size of the index.
+        """
+        with metrics.timer("embedding.encode_queries"), torch.no_grad():
+            queries = self.query_encoder.encode(queries, batch_size=batch_size or self.batch_size)
             queries = np.atleast_2d(queries)
 
-        scores, searches = self.dataset.get_nearest_examples_batch(
-            index_name=self.index_col_name,
-            queries=queries,
-            k=k,
-        )
+        if not self.chunked:
+            with metrics.timer("faiss.search"):
+                return self.dataset.search_batch(index_name=self.index_col_name, queries=queries, k=k)
+
+        # The k nearest rows are among the nearest k * (most chunks of a row) chunks
+        chunk_k = min(len(self.texts), k * int(np.bincount(self.owners).max()))
+        with metrics.timer("faiss.search"):
+            scores, indices = self.dataset.search_batch(index_name=self.index_col_name, queries=queries, k=chunk_k)
+        return aggregate_chunks(scores, indices, self.owners, k)
+
+    def semantic_search(self, queries, k=10):
+        scores, indices = self.search(queries, k=k)
+
+        searches, total_scores = [], []
+        for query_scores, query_indices in zip(scores, indices):
+            found = query_indices[query_indices >= 0]
+            searches.append(self.dataframe.iloc[found].to_dict(orient="list"))
+            total_scores.append(query_scores[:len(found)])
+
+        return searches, total_scores
+
+
+_indexes = Registry(MAX_INDEXES)
+
+
+def get_index(dataframe, index_src_col="content", fingerprint=None, **kwargs):
+    """
+    Returns an HFSTIndex over dataframe[index_src_col], reusing one of the MAX_INDEXES most recently used indexes
+    built over the same texts with the same arguments. Search results are row positions into dataframe.
 
-        return searches, scores
+    fingerprint is the corpus_fingerprint of the texts if already known, it is computed otherwise.
+    """
+    if fingerprint is None:
+        fingerprint = corpus_fingerprint([text_hash(text) for text in dataframe[index_src_col]])
+    key = (fingerprint, index_src_col, json.dumps(kwargs, sort_keys=True, default=str))
+    return _indexes.get(key, lambda: HFSTIndex(dataframe, index_src_col=index_src_col, **kwargs))
@@ -0,0 +1,173 @@
+import json
+import time
+import threading
+import numpy as np
+
+from pathlib import Path
+from contextlib import contextmanager, nullcontext
+
+
+# Instrumented code only builds events while at least one sink is registered, with no sinks every
+# timer/count/observe call returns after a single check
+_sinks = []
+_disabled = nullcontext()
+
+
+class MemorySink:
+    """
+    Keeps all events in memory, e.g. for tests or to summarize a run.
+    """
+
+    def __init__(self):
+        self.events = []
+        self._lock = threading.Lock()
+
+    def emit(self, event):
+        with self._lock:
+            self.events.append(event)
+
+    def clear(self):
+        with self._lock:
+            self.events = []
+
+    def values(self, name, **tags):
+        """
+        Values of the events called name whose tags include tags.
+        """
+        with self._lock:
+            events = list(self.events)
+        return [
+            event["value"] for event in events
+            if event["name"] == name and all(event["tags"].get(key) == value for key, value in tags.items())
+        ]
+
+    def summary(self):
+        """
+        Aggregates the events per name and tags ("llm.latency{backend=ollama}"): counters are summed, timers and
+        histograms are reduced to count, total, mean, p50, p90, p99 and max. For every pair of counters x.hits
+        and x.misses with the same tags x.hit_rate is added.
+        """
+        with self._lock:
+            events = list(self.events)
+
+        counters, series = {}, {}
+        for event in events:
+            tags = ",".join(f"{key}={value}" for key, value in sorted(event["tags"].items()))
+            key = f"{event['name']}{{{tags}}}" if tags else event["name"]
+            if event["type"] == "counter":
+                counters[key] = counters.get(key, 0) + event["value"]
+            else:
+                series.setdefault(key, []).append(event["value"])
+
+        summary = dict(counters)
+        for key, hits in counters.items():
+            name, _, tags = key.partition("{")
+            if name.endswith(".hits"):
+                misses = counters.get(name[:-len("hits")] + "misses" + ("{" + tags if tags else ""), 0)
+                rate_key = name[:-len("hits")] + "hit_rate" + ("{" + tags if tags else "")
+                summary[rate_key] = hits / (hits + misses) if hits + misses else 0.0
+        for key, values in series.items():
+            values = np.asarray(values, dtype=np.float64)
+            p50, p90, p99 = np.percentile(values, [50, 90, 99])
+            summary[key] = {
+                "count": len(values),
+                "total": float(values.sum()),
+                "mean": float(values.mean()),
+                "p50": float(p50),
+                "p90": float(p90),
+                "p99": float(p99),
+                "max": float(values.max()),
+            }
+        return summary
+
+
+class JSONLinesSink:
+    """
+    Appends every event as one JSON object per line to path.
+    """
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.file = open(self.path, "a", encoding="utf-8")
+        self._lock = threading.Lock()
+
+    def emit(self, event):
+        line = json.dumps(event, default=str)
+        with self._lock:
+            self.file.write(line + "\n")
+            self.file.flush()
+
+    def close(self):
+        with self._lock:
+            self.file.close()
+
+
+def add_sink(sink):
+    """
+    Starts sending events to sink, any object with an emit(event) method. Returns the sink.
+    """
+    _sinks.append(sink)
+    return sink
+
+
+def remove_sink(sink):
+    if sink in _sinks:
+        _sinks.remove(sink)
+
+
+def clear_sinks():
+    _sinks.clear()
+
+
+def enabled():
+    return bool(_sinks)
+
+
+def _emit(kind, name, value, tags):
+    event = {"type": kind, "name": name, "value": value, "tags": tags, "time": time.time()}
+    for sink in list(_sinks):
+        sink.emit(event)
+
+
+def count(name, value=1, **tags):
+    """
+    Adds value to the counter name, e.g. count("fetch.bytes", len(text)).
+    """
+    if _sinks:
+        _emit("counter", name, value, tags)
+
+
+def observe(name, value, **tags):
+    """
+    Records one value of the histogram name, e.g. observe("llm.prompt_tokens", 812, backend="ollama").
+    """
+    if _sinks:
+        _emit("histogram", name, value, tags)
+
+
+@contextmanager
+def _timer(name, tags):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        _emit("timer", name, time.perf_counter() - started, tags)
+
+
+def timer(name, **tags):
+    """
+    Context manager recording the seconds spent in its block as the timer name.
+
+        with metrics.timer("corpus.parse", rfcs=len(rfc_ids)):
+            ...
+    """
+    return _timer(name, tags) if _sinks else _disabled
+
+
+def rate(name, items, seconds, **tags):
+    """
+    Records items / seconds (e.g. sections parsed per second) as the histogram name.
+    """
+    if _sinks and seconds > 0:
+        _emit("histogram", name, items / seconds, tags)
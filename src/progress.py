@@ -0,0 +1,48 @@
+import time
+
+
+class Progress:
+    """
+    Progress of a long-running search or extraction: items done out of total, throughput and ETA.
+    """
+
+    def __init__(self, total: int):
+        self.total = total
+        self.done = 0
+        self.started = time.monotonic()
+
+    def update(self, count: int = 1):
+        self.done += count
+
+    @property
+    def elapsed(self) -> float:
+        return time.monotonic() - self.started
+
+    @property
+    def throughput(self) -> float:
+        # Items per second
+        return self.done / self.elapsed if self.elapsed > 0 else 0.0
+
+    @property
+    def eta(self) -> float:
+        # Seconds until all items are done at the current throughput, None before the first item
+        if not self.throughput:
+            return None
+        return (self.total - self.done) / self.throughput
+
+    def as_dict(self) -> dict:
+        return {
+            "done": self.done,
+            "total": self.total,
+            "elapsed": self.elapsed,
+            "throughput": self.throughput,
+            "eta": self.eta,
+        }
+
+    def __str__(self):
+        eta = "?" if self.eta is None else f"{self.eta:.0f}s"
+        return f"{self.done}/{self.total} ({self.throughput:.2f}/s, ETA {eta})"
+
+
+def print_progress(progress: Progress):
+    print(f"\r{progress}", end="\n" if progress.done == progress.total else "", flush=True)
@@ -37,4 +37,31 @@ FILTER_PROMPT_TEMPLATE = """
     # INPUT
 
     {section}
-"""
\ No newline at end of file
+"""
+
+BATCH_SEARCH_PROMPT_TEMPLATE = """ 
+    # ROLE
+
+    You are a research assistant specialized in information extraction from RFC texts.
+
+    # TASK
+
+    You will be provided with {count} numbered RFC sections, 
+    your task is to decide for each section whether it contains
+
+    {description}
+
+    Respond with one line per section, in the form "<section number>: YES" if it does, 
+    else "<section number>: NO", and do not skip any section.
+
+    # INPUT
+
+    Here are the sections you should analyze:
+
+    {sections}
+"""
+
+BATCH_SECTION_TEMPLATE = """### Section {id}
+
+{section}
+"""
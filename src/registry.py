@@ -0,0 +1,56 @@
+import hashlib
+
+from pathlib import Path
+from collections import OrderedDict
+
+
+def text_hash(text):
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def corpus_fingerprint(hashes):
+    return hashlib.sha256("".join(hashes).encode("ascii")).hexdigest()
+
+
+class Registry:
+    """
+    Keeps the max_entries most recently used objects built per corpus (e.g. search indexes), usually keyed by
+    the corpus_fingerprint of the indexed texts.
+    """
+
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key, build=None, path=None, load=None):
+        """
+        Returns the entry of key. A missing entry is loaded with load(path) if path exists, otherwise it is
+        created with build() and, if path is given, written with its save(path). Without build, None is
+        returned for an entry that is neither loaded nor saved.
+        """
+        if key in self._entries:
+            self._entries.move_to_end(key)
+            return self._entries[key]
+
+        if path is not None and load is not None and Path(path).exists():
+            value = load(path)
+        elif build is None:
+            return None
+        else:
+            value = build()
+            if path is not None:
+                value.save(path)
+
+        self._entries[key] = value
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        return value
+
+    def clear(self):
+        self._entries.clear()
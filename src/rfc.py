@@ -1,7 +1,14 @@
 import re
-import requests
+import time
+import bisect
 import pandas as pd
 
+from concurrent.futures import ProcessPoolExecutor
+
+from . import metrics
+from .fetch import fetch_rfc_texts
+from .registry import text_hash
+
 
 def parse_rfc_header(text):
     header_text = text.split("\n\n", 1)[0]  # Get the header part
@@ -53,117 +60,384 @@ def parse_rfc_header(text):
     return rfc_info
 
 
-def clean_up_rfc_text(text):
-    result = ""
-    lines = text.splitlines()
-    last_line_was_empty = False
+PAGE_FOOTER_RE = re.compile(r"\[Page \d+\]")
+RUNNING_HEADER_RE = re.compile(r"RFC \d{4}")
+MONTH_RE = re.compile(r"January|February|March|April|May|June|July|August|September|October|November|December")
 
 
+def _clean_lines(lines):
+    last_line_was_empty = False
+
     for line in lines:
         # Skip empty lines
-        if not line.strip():
+        if not line or line.isspace():
             if last_line_was_empty:
                 continue
             last_line_was_empty = True
-            result += "\n"
+            yield ""
             continue
         else:
             last_line_was_empty = False
-            
-        if re.search(r"\[Page \d+\]", line):
+
+        if PAGE_FOOTER_RE.search(line):
             continue
 
-        if re.search(r"^RFC \d{4}", line) and re.search(r"January|February|March|April|May|June|July|August|September|October|November|December", line):
+        if RUNNING_HEADER_RE.match(line) and MONTH_RE.search(line):
             continue
-        
-        result += line + "\n"
-        
-    return result
+
+        yield line
+
+
+def iter_clean_rfc_lines(lines):
+    """
+    Yields the lines of an RFC (without line breaks) minus page footers, running headers and repeated empty lines.
+
+    lines can be any iterable of lines, e.g. an open file.
+    """
+    return _clean_lines(line for raw in lines for line in (raw.splitlines() or [""]))
+
+
+def clean_up_rfc_text(text):
+    lines = list(_clean_lines(text.splitlines()))
+    return "\n".join(lines) + "\n" if lines else ""
+
+
+INTRODUCTION_RE = re.compile(r"1.\s*Introduction\s+\n")
+SECTION_TITLE_RE = re.compile(r"\n(\d+\.(?:\d+\.)*)\s+(.*)\n")
+HEADING_NUMBER_RE = re.compile(r"\n[ \t]*(\d+\.(?:\d+\.)*)")
+
+
+def _title_pattern(title):
+    # Allow whitespace (e.g. line breaks) between the characters of a title
+    return re.compile(r"\s*" + r"\s*".join(re.escape(char) for char in title if char not in ["\n", "\r"]))
+
+
+def _match_title(text, offset, title):
+    # Like _title_pattern(title).match(text, offset) without compiling a pattern, returns the end or -1
+    position = offset
+    for char in title:
+        if char.isspace():
+            continue
+        while position < len(text) and text[position].isspace():
+            position += 1
+        if position == len(text) or text[position] != char:
+            return -1
+        position += 1
+    return position
+
+
+def _word_count(content):
+    # Number of parts of re.split(r"\s+", content), which counts leading/trailing whitespace as a word
+    if not content:
+        return 1
+    return len(content.split()) + content[0].isspace() + content[-1].isspace()
 
 
 def extract_sections(text):
-    section_titles = []
-    try:
-        parts = re.split(r"1.\s*Introduction\s+\n", text)
-        pre = parts[0]
-        post = "1. Introduction\n" + "1. Introduction\n".join(parts[1:])
-        table_of_contents = pre.split("Table of Contents")[1]
-
-        for row in re.split(r"\d+\n", table_of_contents):
-            if match := re.search(r"(\d+\.(?:\d+\.)*)\s+(.*?)(?=(?:\s*\d+\.)?\.\s*)*$)", row, re.DOTALL):
-                number = match.group(1)
-                title = re.sub(r"\s+", " ", re.split(r"\s*\.*$", match.group(2))[0]).strip()
-                section_titles.append((number, title))
-    except Exception as e:
-        section_titles = re.findall(r"\n(\d+\.(?:\d+\.)*)\s+(.*)\n", text)
+    """
+    Splits an RFC into sections at its numbered headings.
 
-    sections = []
+    The body is scanned once for section number tokens; each candidate title is then placed at the first
+    following token with its number whose title matches, and contents are sliced between consecutive
+    headings. start/end are the character offsets of a section's content in text.
+    """
+    introduction = INTRODUCTION_RE.search(text)
+    if introduction is None:
+        return []
+    body_start = introduction.start()
+
+    # Every "<number> <title>" line is a candidate heading, TOC lines included; headings are then placed
+    # in this order after the introduction
+    section_titles = SECTION_TITLE_RE.findall(text)
+
+    # Single scan over the body: end offsets of the section numbers starting a line
+    tokens = {}
+    for match in HEADING_NUMBER_RE.finditer(text, max(text.rfind("\n", 0, body_start), 0)):
+        tokens.setdefault(match.group(1), []).append(match.end())
+
+    # Place headings in the order of section_titles, each after the previous one
+    headings = [None] * len(section_titles)
+    cursor = body_start
     for idx, (number, title) in enumerate(section_titles):
-        pattern = re.escape(number) + r'\s*' + r'[\s\r\n]*'.join(re.escape(char) for char in title if char not in ["\n", "\r"])  # Allow spaces between characters
-        try:
-            content = re.split(pattern, post)[1]
-        except Exception:
-            try:
-                alternative_pattern = r'\s*' + r'[\s\r\n]*'.join(re.escape(char) for char in title if char not in ["\n", "\r"])  
-                content = re.split(alternative_pattern, post)[1]
-            except Exception:
-                continue
-        if idx < len(section_titles) - 1:
-            pattern = re.escape(section_titles[idx + 1][0]) + r'\s*' + r'[\s\r\n]*'.join(re.escape(char) for char in section_titles[idx + 1][1] if char not in ["\n", "\r"])
-            content = re.split(pattern, content)[0]
+        offsets = tokens.get(number, [])
+        for i in range(bisect.bisect_left(offsets, cursor + len(number)), len(offsets)):
+            if (end := _match_title(text, offsets[i], title)) != -1:
+                headings[idx] = (offsets[i] - len(number), end)
+                cursor = end
+                break
+
+    # Headings without a matching number are searched by title between their found neighbours
+    for idx, heading in enumerate(headings):
+        if heading is not None:
+            continue
+        lower = next((headings[i][1] for i in range(idx - 1, -1, -1) if headings[i]), body_start)
+        upper = next((headings[i][0] for i in range(idx + 1, len(headings)) if headings[i]), len(text))
+        if match := _title_pattern(section_titles[idx][1]).search(text, lower, upper):
+            headings[idx] = (match.start(), match.end())
+
+    found = [(idx, heading) for idx, heading in enumerate(headings) if heading is not None]
+    sections = []
+    for position, (idx, (_, start)) in enumerate(found):
+        end = found[position + 1][1][0] if position < len(found) - 1 else len(text)
+        number, title = section_titles[idx]
+        content = text[start:end]
         sections.append({
-            "number": number, 
-            "title": title, 
-            "content": content, 
-            "word_count": len(re.split(r"\s+", content))
+            "number": number,
+            "title": title,
+            "content": content,
+            "word_count": _word_count(content),
+            "start": start,
+            "end": end
         })
 
     return sections
 
 
-def setup_rfc_datasets(rfc_ids):
+def parse_rfc(rfc, text):
+    # Remove Page Numbers etc. and split sections
+    text = clean_up_rfc_text(text)
+    # Parse RFC header to extract obsoletes/updates etc.
+    header_info = parse_rfc_header(text)
+    header_info["rfc_number"] = rfc
+    header_info["text"] = text
+
+    # Split text into sections
+    sections = extract_sections(text)
+
+    return header_info, sections
+
+
+def _parse_rfc_packed(item):
+    # Runs in a worker process: sections are sent back as value tuples without their content,
+    # which is sliced from the cleaned text by offset, to keep pickling cheap
+    header_info, sections = parse_rfc(*item)
+    fields = tuple(sections[0]) if sections else ()
+    return header_info, fields, [
+        tuple(None if key == "content" else value for key, value in section.items())
+        for section in sections
+    ]
+
+
+def parse_rfc_texts(rfc_ids, texts, workers=None, chunksize=8):
+    """
+    Parses RFC texts, optionally in a process pool, yielding (header_info, sections) in the order of rfc_ids.
+
+    Args:
+        rfc_ids(List[int]): RFC numbers of the texts.
+        texts(List[str]): Downloaded RFC texts.
+        workers(int, optional): Number of worker processes, None or 1 parses in the current process.
+        chunksize(int, optional): Number of RFCs sent to a worker at once.
+    """
+    if not workers or workers == 1:
+        yield from map(parse_rfc, rfc_ids, texts)
+        return
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        for header_info, fields, rows in executor.map(_parse_rfc_packed, zip(rfc_ids, texts), chunksize=chunksize):
+            sections = [dict(zip(fields, row)) for row in rows]
+            for section in sections:
+                section["content"] = header_info["text"][section["start"]:section["end"]]
+            yield header_info, sections
+
+
+SECTION_NUMBER_RE = re.compile(r"\d+\.(?:\d+\.)*")
+NUMBER_RUN_RE = re.compile(r"[\d.]*\d[\d.]*")
+
+
+def section_number_tokens(text, max_length, wanted=None):
+    """
+    Returns all section numbers (e.g. "4.2.") that occur as substrings of text and are at most max_length long.
+
+    A section number only consists of digits and dots, so every occurrence lies inside a maximal run of
+    such characters; enumerating the candidates of each run finds exactly the numbers `number in text` would.
+    """
+    tokens = set()
+    for run in NUMBER_RUN_RE.findall(text):
+        for end, char in enumerate(run, 1):
+            if char != ".":
+                continue
+            for start in range(max(0, end - max_length), end - 1):
+                candidate = run[start:end]
+                if candidate[0] != "." and ".." not in candidate and (wanted is None or candidate in wanted):
+                    tokens.add(candidate)
+    return tokens
+
+
+def link_sections(rfc_df, section_df, rfcs=None):
+    """
+    Fills updated_by/obsoleted_by of section_df in place.
+
+    A section of an updated RFC is linked to every section of the updating RFC whose title or content
+    mentions its number, found through an index of section number tokens per updating RFC. A section of an
+    obsoleted RFC is linked to the sections of the obsoleting RFC with the same title.
+    If rfcs is given, only the updates/obsoletes edges starting or ending in one of these RFCs are linked.
+    """
+    if section_df.empty:
+        return
+
+    numbers = section_df["number"].tolist()
+    titles = section_df["title"].tolist()
+    contents = section_df["content"].tolist()
+    updated_by = section_df["updated_by"].tolist()
+    obsoleted_by = section_df["obsoleted_by"].tolist()
+    positions = section_df.groupby("rfc", sort=False).indices
+
+    for rfc, updates, obsoletes in zip(rfc_df["rfc_number"].tolist(), rfc_df["updates"], rfc_df["obsoletes"]):
+        source_dirty = rfcs is None or rfc in rfcs
+        updates = [updated for updated in updates if source_dirty or updated in rfcs]
+        obsoletes = [obsoleted for obsoleted in obsoletes if source_dirty or obsoleted in rfcs]
+        new_sections = positions.get(rfc, [])
+        if not len(new_sections):
+            continue
+
+        if updates:
+            # Identify updated sections through the section numbers mentioned by the new sections
+            wanted = {numbers[i] for updated in updates for i in positions.get(updated, [])}
+            max_length = max(map(len, wanted), default=0)
+            mentions = {}
+            for i in new_sections:
+                tokens = section_number_tokens(titles[i], max_length, wanted)
+                tokens |= section_number_tokens(contents[i], max_length, wanted)
+                for token in tokens:
+                    mentions.setdefault(token, []).append(numbers[i])
+
+            for updated in updates:
+                for i in positions.get(updated, []):
+                    number = numbers[i]
+                    if SECTION_NUMBER_RE.fullmatch(number):
+                        matches = mentions.get(number, [])
+                    else:
+                        matches = [numbers[j] for j in new_sections if number in titles[j] or number in contents[j]]
+                    # Mark as updated.
+                    updated_by[i].extend((rfc, match) for match in matches)
+
+        if obsoletes:
+            # Identify obsoleted sections by their title
+            same_title = {}
+            for i in new_sections:
+                same_title.setdefault(titles[i], []).append(numbers[i])
+
+            for obsoleted in obsoletes:
+                for i in positions.get(obsoleted, []):
+                    obsoleted_by[i].extend((rfc, match) for match in same_title.get(titles[i], []))
+
+
+def setup_rfc_datasets(
+        rfc_ids,
+        cache_dir=".rfc_cache",
+        mirror_dir=None,
+        offline=False,
+        max_workers=16,
+        store=None,
+        parse_workers=None,
+        parse_chunksize=8,
+        missing="raise"
+):
+    """
+    Downloads and parses RFCs into rfc_df (one row per RFC) and section_df (one row per section).
+
+    Args:
+        rfc_ids(List[int]): RFC numbers to include.
+        cache_dir(str, optional): Directory of the download cache, None disables caching.
+        mirror_dir(str, optional): Local directory with rfc<N>.txt files used instead of the network.
+        offline(bool, optional): Only use the mirror and the download cache.
+        max_workers(int, optional): Number of concurrent downloads.
+        store(CorpusStore, optional): Persistent corpus; only RFCs whose text changed since the
+            stored build are parsed and linked again, the result is written back.
+        parse_workers(int, optional): Number of processes used for cleaning and splitting the texts.
+        parse_chunksize(int, optional): Number of RFCs handed to a parse worker at once.
+        missing(str, optional): "skip" leaves out RFCs that are not published (e.g. unassigned numbers of a
+            bulk range) instead of raising, see fetch_rfc_texts.
+    """
+    rfc_ids = list(dict.fromkeys(rfc_ids))
+
+    # Download RFC texts concurrently, reusing cached copies where they are still current
+    with metrics.timer("corpus.fetch"):
+        texts = fetch_rfc_texts(
+            rfc_ids,
+            cache_dir=cache_dir,
+            mirror_dir=mirror_dir,
+            offline=offline,
+            max_workers=max_workers,
+            missing=missing
+        )
+    rfc_ids = [rfc for rfc, text in zip(rfc_ids, texts) if text is not None]
+    texts = [text for text in texts if text is not None]
+    hashes = [text_hash(text) for text in texts]
+
+    stored_rfc_df, stored_section_df = store.load() if store is not None else (None, None)
+    if stored_rfc_df is None:
+        stored_rfc_df, stored_section_df = pd.DataFrame(), pd.DataFrame()
+        known_hashes = {}
+    else:
+        known_hashes = dict(zip(stored_rfc_df["rfc_number"], stored_rfc_df["content_hash"]))
+
     rfc_data = []
     section_data = []
+    pending = [
+        (rfc, text, digest) for rfc, text, digest in zip(rfc_ids, texts, hashes)
+        if known_hashes.get(rfc) != digest
+    ]
+    changed = {rfc for rfc, _, _ in pending}
+
+    # parse_rfc_texts is lazy, so the parse time includes building the section records
+    started = time.perf_counter()
+    with metrics.timer("corpus.parse"):
+        parsed = parse_rfc_texts(
+            [rfc for rfc, _, _ in pending],
+            [text for _, text, _ in pending],
+            workers=parse_workers,
+            chunksize=parse_chunksize
+        )
+        for (rfc, _, digest), (header_info, sections) in zip(pending, parsed):
+            header_info["content_hash"] = digest
+            rfc_data.append(header_info)
+
+            for section in sections:
+                section["rfc"] = rfc
+                section["updated_by"] = []
+                section["obsoleted_by"] = []
+                section_data.append(section)
+    metrics.rate("corpus.sections_per_second", len(section_data), time.perf_counter() - started)
+    metrics.count("corpus.rfcs_parsed", len(pending))
+    metrics.count("corpus.rfcs_reused", len(rfc_ids) - len(pending))
+    metrics.count("corpus.sections_parsed", len(section_data))
+
+    if not known_hashes:
+        rfc_df = pd.DataFrame(rfc_data)
+        section_df = pd.DataFrame(section_data)
+        with metrics.timer("corpus.link"):
+            link_sections(rfc_df, section_df)
+    else:
+        # Links originating from changed or dropped RFCs are recomputed/removed, everything else is kept
+        dirty = changed | (set(known_hashes) - set(rfc_ids))
+        kept_rfcs = set(rfc_ids) - changed
+
+        rfc_df = pd.concat([
+            stored_rfc_df[stored_rfc_df["rfc_number"].isin(kept_rfcs)],
+            pd.DataFrame(rfc_data)
+        ], ignore_index=True)
+        kept_sections = stored_section_df[stored_section_df["rfc"].isin(kept_rfcs)].copy()
+        for column in ["updated_by", "obsoleted_by"]:
+            kept_sections[column] = kept_sections[column].map(
+                lambda links: [link for link in links if link[0] not in dirty]
+            )
+        section_df = pd.concat([kept_sections, pd.DataFrame(section_data)], ignore_index=True)
+
+        # Restore the order of rfc_ids, as in a full build
+        position = {rfc: i for i, rfc in enumerate(rfc_ids)}
+        rfc_df = rfc_df.sort_values("rfc_number", key=lambda column: column.map(position), kind="stable", ignore_index=True)
+        section_df = section_df.sort_values("rfc", key=lambda column: column.map(position), kind="stable", ignore_index=True)
+
+        if changed:
+            with metrics.timer("corpus.link"):
+                link_sections(rfc_df, section_df, rfcs=changed)
+            for column in ["updated_by", "obsoleted_by"]:
+                for links in section_df[column]:
+                    links.sort(key=lambda link: position[link[0]])
+
+    if store is not None:
+        with metrics.timer("corpus.save"):
+            store.save(rfc_df, section_df)
 
-    for rfc in rfc_ids:
-        # Download RFC text
-        text = requests.get(f"https://www.ietf.org/rfc/rfc{rfc}.txt").text
-        # Remove Page Numbers etc. and split sections
-        text = clean_up_rfc_text(text)
-        # Parse RFC header to extract obsoletes/updates etc.
-        header_info = parse_rfc_header(text)
-        header_info["rfc_number"] = rfc
-        header_info["text"] = text
-
-        rfc_data.append(header_info)
-
-        # Split text into sections
-        sections = extract_sections(text)
-        
-        for section in sections:
-            section["rfc"] = rfc
-            section["updated_by"] = []
-            section["obsoleted_by"] = []
-            section_data.append(section)
-
-    rfc_df = pd.DataFrame(rfc_data)
-    section_df = pd.DataFrame(section_data)
-
-    for _, rfc_info in rfc_df.iterrows():
-        # Identify updated and obsoleted sections
-        for updated in rfc_info["updates"]:
-            old_sections = section_df[section_df.rfc == updated]
-            for idx, old_section in old_sections.iterrows():
-                for _, potential_new_section in section_df[section_df.rfc == rfc_info["rfc_number"]].iterrows():
-                    if old_section["number"] in potential_new_section["title"] or old_section["number"] in potential_new_section["content"]:
-                        # Mark as updated.
-                        section_df.loc[idx, "updated_by"].append((rfc_info["rfc_number"], potential_new_section["number"]))                        
-
-        for obsoleted in rfc_info["obsoletes"]:
-            old_sections = section_df[section_df.rfc == obsoleted]
-            for idx, old_section in old_sections.iterrows():
-                for _, potential_new_section in section_df[section_df.rfc == rfc_info["rfc_number"]].iterrows():
-                    if old_section["title"] == potential_new_section["title"]:
-                        section_df.loc[idx, "obsoleted_by"].append((rfc_info["rfc_number"], potential_new_section["number"]))
-
-    return rfc_df, section_df
\ No newline at end of file
+    return rfc_df, section_df
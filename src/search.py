@@ -1,10 +1,517 @@
+import os
+import re
+import json
+import logging
 import pydantic
 import settings
+import numpy as np
 import pandas as pd
-from typing import List
-from .ai import query_model
+from typing import Callable, Dict, List, Union
+from collections import OrderedDict
+from .ai import estimate_tokens, iter_query_model_concurrently, query_model
 from .prompts import *
-from .index import HFSTIndex
+from .lexical import BUILD_AFTER_KEYWORDS, compile_pattern, get_keyword_index, has_keyword_indexes
+from .progress import Progress
+from .registry import corpus_fingerprint, text_hash
+
+# .index (torch, datasets, sentence_transformers, faiss) and .bm25 (scipy) are imported on first use,
+# so keyword and regex search start without loading them
+
+logger = logging.getLogger(__name__)
+
+
+# Also accepts the "Section 1: YES" and "### Section 1: YES" forms models often answer in. The number and its
+# answer must be on one line, so section text the model quotes back is not read as answers
+BATCH_ANSWER_RE = re.compile(
+    r"^[^\w\n]*(?:#+[^\S\n]*)?(?:section[^\S\n]*)?(\d+)[^\w\n]*(YES|NO)\b", re.IGNORECASE | re.MULTILINE
+)
+
+
+def pack_sections(contents: List[str], token_budget: int):
+    """
+    Groups consecutive sections into batches whose estimated token count stays within token_budget.
+
+    A section exceeding the budget on its own forms a batch of one.
+    """
+    batches, batch, tokens = [], [], 0
+    for position, content in enumerate(contents):
+        size = estimate_tokens(content)
+        if batch and tokens + size > token_budget:
+            batches.append(batch)
+            batch, tokens = [], 0
+        batch.append(position)
+        tokens += size
+    if batch:
+        batches.append(batch)
+    return batches
+
+
+def parse_batch_answers(text: str, count: int):
+    """
+    Parses "[Section] <number>: YES/NO" lines of a batched answer into {number: bool}, ignoring unknown numbers.
+    """
+    answers = {}
+    for number, answer in BATCH_ANSWER_RE.findall(text):
+        if 1 <= int(number) <= count:
+            answers.setdefault(int(number), answer.upper() == "YES")
+    return answers
+
+
+class SectionSearcher:
+    """
+    Search session over a fixed DataFrame of sections.
+
+    The semantic index (and with it the encoder) is loaded on first use and kept for later
+    queries, so keyword, regex, semantic and LLM searches can be mixed without reloading.
+    Further arguments (e.g. index_type, index_params) are passed on to HFSTIndex.
+    """
+
+    def __init__(
+            self,
+            sections: pd.DataFrame,
+            index_encoder: str = "all-mpnet-base-v2",
+            keyword_index_dir: str = ".lexical",
+            bm25_index_dir: str = ".bm25",
+            **index_args
+    ):
+        self.sections = sections
+        self.index_encoder = index_encoder
+        self.keyword_index_dir = keyword_index_dir
+        self.bm25_index_dir = bm25_index_dir
+        self.index_args = index_args
+        self._index = None
+        self._keyword_index = None
+        self._bm25_index = None
+        self._contents = None
+        self._fingerprint = None
+        self._scanned_keywords = 0
+
+    @property
+    def index(self):
+        if self._index is None:
+            from .index import get_index
+            self._index = get_index(
+                self.sections,
+                index_src_col="content",
+                fingerprint=self.fingerprint,
+                index_encoder=self.index_encoder,
+                **self.index_args
+            )
+        return self._index
+
+    @property
+    def contents(self):
+        if self._contents is None:
+            self._contents = self.sections["content"].fillna("").tolist()
+        return self._contents
+
+    @property
+    def fingerprint(self):
+        # Identifies the contents in the index registries, hashed once per searcher
+        if self._fingerprint is None:
+            self._fingerprint = corpus_fingerprint([text_hash(text) for text in self.contents])
+        return self._fingerprint
+
+    @property
+    def keyword_index(self):
+        if self._keyword_index is None:
+            self._keyword_index = get_keyword_index(
+                self.contents, directory=self.keyword_index_dir, fingerprint=self.fingerprint
+            )
+        return self._keyword_index
+
+    @property
+    def bm25_index(self):
+        if self._bm25_index is None:
+            from .bm25 import get_bm25_index
+            self._bm25_index = get_bm25_index(
+                self.contents, directory=self.bm25_index_dir, fingerprint=self.fingerprint
+            )
+        return self._bm25_index
+
+    def keyword_matches(self, keywords: List[str]):
+        """
+        Returns {section position: keywords it contains, in the order given}.
+        """
+        # A corpus without a saved index is scanned, the index only pays off once it is searched repeatedly
+        build = self._scanned_keywords >= BUILD_AFTER_KEYWORDS
+        if self._keyword_index is None and (build or has_keyword_indexes(self.keyword_index_dir)):
+            self._keyword_index = get_keyword_index(
+                self.contents, directory=self.keyword_index_dir, fingerprint=self.fingerprint, build=build
+            )
+
+        if self._keyword_index is not None:
+            hits = self._keyword_index.search(self.contents, keywords)
+        else:
+            # One pass with all keywords combined finds the sections containing any of them, each keyword is then
+            # only looked for in those. str.contains runs in Arrow's compute kernels for Arrow-backed strings
+            unique = list(dict.fromkeys(keywords))
+            column = self.sections["content"]
+            candidates = np.arange(len(column))
+            if len(unique) > 1:
+                combined = "|".join(f"(?:{keyword})" for keyword in unique)
+                candidates = np.flatnonzero(column.str.contains(combined, na=False).to_numpy(dtype=bool))
+                column = column.iloc[candidates]
+            hits = {
+                keyword: candidates[column.str.contains(keyword, na=False).to_numpy(dtype=bool)].tolist()
+                for keyword in unique
+            }
+            self._scanned_keywords += len(hits)
+
+        matches = {}
+        for keyword, positions in hits.items():
+            for position in positions:
+                matches.setdefault(position, []).append(keyword)
+        return matches
+
+    def keywords(self, keywords: List[str]):
+        """
+        Sections containing any of keywords, each once and in their original order, with a matched_keywords column.
+        """
+        matches = self.keyword_matches(keywords)
+        positions = sorted(matches)
+
+        result = self.sections.iloc[positions].copy()
+        result["matched_keywords"] = [matches[position] for position in positions]
+        return result
+
+    def regex(self, regex: str):
+        pattern = compile_pattern(regex)
+        return self.sections[np.array([bool(pattern.search(content)) for content in self.contents], dtype=bool)]
+
+    def semantic(self, search_query: str, num_sections: int = 10, similarity_threshold: float = 100.0):
+        scores, indices = self.index.search(search_query, k=num_sections)
+        found = indices[0] >= 0
+
+        result = self.sections.iloc[indices[0][found]].copy()
+        result["score"] = scores[0][found]
+        return result[result.score < similarity_threshold]
+
+    def bm25(self, search_query: str, num_sections: int = 10):
+        scores, positions = self.bm25_index.search(search_query, k=num_sections)
+
+        result = self.sections.iloc[positions].copy()
+        result["score"] = scores
+        return result
+
+    def hybrid(
+            self,
+            search_query: str,
+            num_sections: int = 10,
+            fusion: str = "rrf",
+            semantic_weight: float = 0.5,
+            candidates: int = 100,
+            rrf_k: int = 60
+    ):
+        """
+        Fuses the BM25 and the semantic ranking of the top candidates of each.
+
+        fusion="rrf" ranks by reciprocal rank fusion, fusion="weighted" by
+        semantic_weight * semantic + (1 - semantic_weight) * BM25 score, both min-max normalized.
+        Returns the num_sections best sections with the fused score and the bm25_score and
+        semantic_score (distance) of the lists they were found in.
+        """
+        assert fusion in ("rrf", "weighted"), f"Unknown fusion {fusion}, expected rrf or weighted."
+        from .bm25 import reciprocal_rank_fusion, weighted_fusion
+
+        bm25_scores, bm25_positions = self.bm25_index.search(search_query, k=candidates)
+        distances, indices = self.index.search(search_query, k=candidates)
+        found = indices[0] >= 0
+        semantic_positions, distances = indices[0][found], distances[0][found]
+
+        bm25 = dict(zip(bm25_positions.tolist(), bm25_scores.tolist()))
+        semantic = dict(zip(semantic_positions.tolist(), distances.tolist()))
+        if fusion == "rrf":
+            fused = reciprocal_rank_fusion([bm25_positions.tolist(), semantic_positions.tolist()], k=rrf_k)
+        else:
+            # Distances turned into similarities, higher is better for both
+            fused = weighted_fusion(
+                [{position: -distance for position, distance in semantic.items()}, bm25],
+                [semantic_weight, 1 - semantic_weight]
+            )
+
+        top = sorted(fused, key=fused.get, reverse=True)[:num_sections]
+        result = self.sections.iloc[top].copy()
+        result["score"] = [fused[position] for position in top]
+        result["bm25_score"] = [bm25.get(position, np.nan) for position in top]
+        result["semantic_score"] = [semantic.get(position, np.nan) for position in top]
+        return result
+
+    def semantic_batch(
+            self,
+            search_queries: Union[List[str], Dict[str, str]],
+            num_sections: int = 10,
+            similarity_threshold: float = 100.0,
+            batch_size: int = 64
+    ):
+        """
+        Runs many semantic searches at once, see search_sections_batch.
+        """
+        if isinstance(search_queries, dict):
+            query_ids, queries = list(search_queries), list(search_queries.values())
+        else:
+            query_ids, queries = list(range(len(search_queries))), list(search_queries)
+
+        scores, indices = self.index.search(queries, k=num_sections, batch_size=batch_size)
+
+        # Threshold all queries at once, rows come out grouped by query and ordered by rank
+        keep = (indices >= 0) & (scores < similarity_threshold)
+        query_positions, ranks = np.nonzero(keep)
+
+        result = self.sections.iloc[indices[keep]].reset_index(names="section_index")
+        result.insert(0, "query_id", np.asarray(query_ids, dtype=object)[query_positions])
+        result.insert(1, "rank", ranks + 1)
+        result["score"] = scores[keep]
+        return result
+
+    def prefilter(
+            self,
+            description: str,
+            top_n: int = None,
+            threshold: float = None,
+            keywords: List[str] = None
+    ):
+        """
+        Cheap first stage of the LLM cascade: keeps the top_n sections closest to description and/or those
+        with a semantic distance below threshold, plus every section containing one of keywords.
+
+        Returns the candidate sections in their original order with a prefilter_score (semantic distance, inf for
+        keyword matches beyond the top_n when no threshold is given).
+        """
+        assert top_n is not None or threshold is not None or keywords, "The prefilter needs top_n, threshold or keywords."
+
+        # Only a threshold needs the distances of all sections, top_n alone only the nearest top_n
+        k = top_n if threshold is None and top_n is not None else len(self.sections)
+        scores, indices = self.index.search(description, k=min(k, len(self.sections)))
+        found = indices[0] >= 0
+        distance = np.full(len(self.sections), np.inf, dtype=np.float32)
+        distance[indices[0][found]] = scores[0][found]
+
+        keep = np.zeros(len(self.sections), dtype=bool)
+        if top_n is not None:
+            keep[indices[0][found][:top_n]] = True
+        if threshold is not None:
+            keep |= distance < threshold
+        if keywords:
+            keep[list(self.keyword_matches(keywords))] = True
+
+        candidates = self.sections[keep].copy()
+        candidates["prefilter_score"] = distance[keep]
+        return candidates
+
+    def evaluate_prefilter(
+            self,
+            description: str,
+            top_n: int = None,
+            threshold: float = None,
+            keywords: List[str] = None,
+            filter: pydantic.BaseModel = None,
+            sample_size: int = 100,
+            seed: int = 0,
+            max_concurrency: int = 8
+    ):
+        """
+        Estimates what the prefilter costs in recall by running the full LLM stage on a random sample.
+
+        Sections count as relevant if the LLM search selects them, or, given a filter, if extraction finds something.
+        Returns the pruning rate over all sections and the recall of the prefilter on the relevant sampled sections.
+        """
+        candidates = self.prefilter(description, top_n=top_n, threshold=threshold, keywords=keywords)
+        sample = self.sections.sample(n=min(sample_size, len(self.sections)), random_state=seed)
+
+        if filter is not None:
+            analyses = extract_contexts(sample, filter, max_concurrency=max_concurrency)
+            relevant = sample.index[[bool(analysis) for analysis in analyses]]
+        else:
+            relevant = SectionSearcher(sample).llm(description, max_concurrency=max_concurrency).index
+
+        kept = relevant.isin(candidates.index)
+        return {
+            "sections": len(self.sections),
+            "candidates": len(candidates),
+            "pruning_rate": 1 - len(candidates) / len(self.sections) if len(self.sections) else 0.0,
+            "sample_size": len(sample),
+            "sample_relevant": len(relevant),
+            "estimated_recall": float(kept.mean()) if len(relevant) else None,
+        }
+
+    def _llm_candidates(self, search_query, prefilter_top_n, prefilter_threshold, prefilter_keywords):
+        if prefilter_top_n is None and prefilter_threshold is None and not prefilter_keywords:
+            return self.sections
+        return self.prefilter(
+            search_query,
+            top_n=prefilter_top_n,
+            threshold=prefilter_threshold,
+            keywords=prefilter_keywords
+        ).drop(columns=["prefilter_score"])
+
+    def llm(
+            self,
+            search_query: str,
+            max_concurrency: int = 8,
+            batch_tokens: int = 0,
+            prefilter_top_n: int = None,
+            prefilter_threshold: float = None,
+            prefilter_keywords: List[str] = None
+    ):
+        sections = self._llm_candidates(search_query, prefilter_top_n, prefilter_threshold, prefilter_keywords)
+
+        selected = np.zeros(len(sections), dtype=bool)
+        for position, match in self._iter_llm_select(sections, search_query, max_concurrency, batch_tokens):
+            selected[position] = match
+        return sections[selected]
+
+    def iter_llm(
+            self,
+            search_query: str,
+            max_concurrency: int = 8,
+            batch_tokens: int = 0,
+            prefilter_top_n: int = None,
+            prefilter_threshold: float = None,
+            prefilter_keywords: List[str] = None,
+            progress: Callable[[Progress], None] = None
+    ):
+        """
+        Like llm, but yields each matching section (a row named by its index) as soon as the LLM answered for it.
+
+        progress is called with a Progress after every answered section.
+        """
+        sections = self._llm_candidates(search_query, prefilter_top_n, prefilter_threshold, prefilter_keywords)
+
+        tracker = Progress(len(sections))
+        for position, match in self._iter_llm_select(sections, search_query, max_concurrency, batch_tokens):
+            tracker.update()
+            if progress is not None:
+                progress(tracker)
+            if match:
+                yield sections.iloc[position]
+
+    def _iter_llm_select(self, sections, search_query, max_concurrency, batch_tokens):
+        # Yields (position, selected) for every section in the order the answers arrive
+        contents = sections["content"].tolist()
+
+        def single_prompt(position):
+            return [{
+                "role": "user",
+                "content": SEARCH_PROMPT_TEMPLATE.format(description=search_query, section=contents[position])
+            }]
+
+        def batch_prompt(batch):
+            return [{
+                "role": "user",
+                "content": BATCH_SEARCH_PROMPT_TEMPLATE.format(
+                    count=len(batch),
+                    description=search_query,
+                    sections="\n".join(
+                        BATCH_SECTION_TEMPLATE.format(id=i, section=contents[position]) for i, position in enumerate(batch, 1)
+                    )
+                )
+            }]
+
+        batches = pack_sections(contents, batch_tokens) if batch_tokens else [[position] for position in range(len(contents))]
+        responses = iter_query_model_concurrently(
+            settings.MODEL,
+            (single_prompt(batch[0]) if len(batch) == 1 else batch_prompt(batch) for batch in batches),
+            max_concurrency=max_concurrency
+        )
+
+        # Sections the model did not answer for are asked about one at a time
+        retry = []
+        for number, (response, _) in responses:
+            batch = batches[number]
+            if len(batch) == 1:
+                yield batch[0], "YES" in response.content
+                continue
+            answers = parse_batch_answers(response.content, len(batch))
+            for i, position in enumerate(batch, 1):
+                if i in answers:
+                    yield position, answers[i]
+                else:
+                    retry.append(position)
+
+        if retry:
+            responses = iter_query_model_concurrently(
+                settings.MODEL,
+                (single_prompt(position) for position in retry),
+                max_concurrency=max_concurrency
+            )
+            for number, (response, _) in responses:
+                yield retry[number], "YES" in response.content
+
+    def search(
+            self,
+            keywords: List[str] = [],
+            regex: str = "",
+            search_query: str = "",
+            use_llm: bool = False,
+            num_sections: int = 10,
+            similarity_threshold: float = 100.0,
+            max_concurrency: int = 8,
+            batch_tokens: int = 0,
+            prefilter_top_n: int = None,
+            prefilter_threshold: float = None,
+            prefilter_keywords: List[str] = None,
+            hybrid: bool = False,
+            fusion: str = "rrf"
+    ):
+        """
+        Search for sections, see search_sections.
+        """
+        if keywords:
+            return self.keywords(keywords)
+        if regex:
+            return self.regex(regex)
+
+        if search_query and hybrid and not use_llm:
+            return self.hybrid(search_query, num_sections=num_sections, fusion=fusion)
+        if search_query and use_llm:
+            return self.llm(
+                search_query,
+                max_concurrency=max_concurrency,
+                batch_tokens=batch_tokens,
+                prefilter_top_n=prefilter_top_n,
+                prefilter_threshold=prefilter_threshold,
+                prefilter_keywords=prefilter_keywords
+            )
+        elif search_query:
+            return self.semantic(search_query, num_sections=num_sections, similarity_threshold=similarity_threshold)
+        else:
+            return pd.DataFrame()
+
+
+MAX_SEARCHERS = 4  # number of SectionSearcher instances kept by get_searcher
+_searchers = OrderedDict()
+
+
+def _content_version(sections: pd.DataFrame):
+    # Arrow-backed strings are immutable, any change to the column replaces its Arrow array; for object
+    # columns the list of strings is compared, which costs a pointer comparison per unchanged string
+    column = sections["content"]
+    if hasattr(column.array, "__arrow_array__"):
+        return column.array.__arrow_array__()
+    return column.fillna("").tolist()
+
+
+def get_searcher(sections: pd.DataFrame):
+    """
+    Returns a SectionSearcher of sections, reused for the MAX_SEARCHERS most recently searched DataFrames so
+    that the module-level functions do not hash the corpus on every call.
+
+    A searcher is reused for the same DataFrame object as long as its content column is unchanged.
+    """
+    key = id(sections)
+    version = _content_version(sections)
+
+    # Entries keep their DataFrame and version alive, so no other object can have the same id meanwhile
+    searcher, cached_version = _searchers.get(key, (None, None))
+    if searcher is None or searcher.sections is not sections or not (
+            cached_version is version or (type(cached_version) is type(version) and cached_version == version)):
+        searcher = SectionSearcher(sections)
+        _searchers[key] = (searcher, version)
+        while len(_searchers) > MAX_SEARCHERS:
+            _searchers.popitem(last=False)
+    _searchers.move_to_end(key)
+    return searcher
 
 
 def search_sections(
@@ -14,57 +521,114 @@ def search_sections(
         search_query: str = "",
         use_llm: bool = False, 
         num_sections: int = 10,
-        similarity_threshold: float = 100.0
+        similarity_threshold: float = 100.0,
+        max_concurrency: int = 8,
+        batch_tokens: int = 0,
+        prefilter_top_n: int = None,
+        prefilter_threshold: float = None,
+        prefilter_keywords: List[str] = None,
+        hybrid: bool = False,
+        fusion: str = "rrf"
 ):
     """ 
     Search for sections in RFCs.
 
+    Searchers (and their indexes) of recently searched DataFrames stay loaded, see get_searcher;
+    use SectionSearcher to keep one for a corpus explicitly.
+
     Args:
         sections(pd.DataFrame): DataFrame containing section data.
-        keyword(str, optional): Keyword to search for.
+        keywords(List[str], optional): Keywords to search for, sections matching several are returned once
+            with the keywords they contain in matched_keywords.
         regex(str, optional): Regular expression to search for.
         search_query(str, optional): Either description of contents for LLM search or input for semantic search
         use_llm(bool, optional): Whether to use llm search or semantic search if search_query is provided
         num_sections(int, optional): Number of semantically similar sections to extract
         similarity_threshold(float, optional): Threshold for semantic similarity used to filter sections
+        max_concurrency(int, optional): Number of sections classified by the LLM in parallel
+        batch_tokens(int, optional): Pack several sections into one LLM prompt of up to this many estimated tokens,
+            0 asks about one section per call
+        prefilter_top_n(int, optional): Only send the sections semantically closest to search_query to the LLM
+        prefilter_threshold(float, optional): Only send sections below this semantic distance to the LLM
+        prefilter_keywords(List[str], optional): Also send sections containing one of these keywords,
+            e.g. a group of templates.KEYWORDS
+        hybrid(bool, optional): Rank by BM25 and semantic search combined instead of semantic search alone,
+            so exact terms such as "CER" are found as well; similarity_threshold does not apply
+        fusion(str, optional): How hybrid search combines the rankings, "rrf" (reciprocal rank) or "weighted"
     """
+    return get_searcher(sections).search(
+        keywords=keywords,
+        regex=regex,
+        search_query=search_query,
+        use_llm=use_llm,
+        num_sections=num_sections,
+        similarity_threshold=similarity_threshold,
+        max_concurrency=max_concurrency,
+        batch_tokens=batch_tokens,
+        prefilter_top_n=prefilter_top_n,
+        prefilter_threshold=prefilter_threshold,
+        prefilter_keywords=prefilter_keywords,
+        hybrid=hybrid,
+        fusion=fusion
+    )
 
-    if keywords:
-        result = pd.DataFrame()
-        for keyword in keywords:
-            result = pd.concat([result, sections[sections["content"].str.contains(keyword, na=False)]], ignore_index=True)
 
-        return result
-    if regex:
-        return sections[sections["content"].str.contains(regex, na=False)]
-    
-    if search_query and use_llm:
-            selected_sections = []
-
-            for idx, section in sections.iterrows():
-                response, _ = query_model(
-                    settings.MODEL, 
-                    messages=[{
-                        "role": "user",
-                        "content": SEARCH_PROMPT_TEMPLATE.format(description=search_query, section=section["content"])
-                    }],
-                    options={
-                        "num_ctx": 100000
-                    })
-                
-                if "YES" in response.content: selected_sections.append(idx)
-                    
-            return sections.loc[selected_sections]
-    elif search_query:
-        index = HFSTIndex(sections, index_src_col="content", overwrite_existing=True)
-        results, scores = index.semantic_search(search_query, k=num_sections)
-        results = pd.DataFrame(results[0])
-        scores = pd.DataFrame(scores[0], columns=["score"])
-
-        joined = pd.concat([results, scores], axis=1)
-        return joined[joined.score < similarity_threshold]
-    else:
-        return pd.DataFrame()
+def iter_search_sections(
+        sections: pd.DataFrame,
+        search_query: str,
+        max_concurrency: int = 8,
+        batch_tokens: int = 0,
+        prefilter_top_n: int = None,
+        prefilter_threshold: float = None,
+        prefilter_keywords: List[str] = None,
+        progress: Callable[[Progress], None] = None
+):
+    """
+    Streaming LLM search: yields matching sections (rows named by their index) as soon as they are classified,
+    in completion order, instead of returning a DataFrame once all sections are done.
+
+    Args:
+        progress(Callable, optional): Called with a Progress (done/total, throughput, ETA) after every section,
+            e.g. progress.print_progress
+        Other arguments as in search_sections with use_llm=True.
+    """
+    yield from get_searcher(sections).iter_llm(
+        search_query,
+        max_concurrency=max_concurrency,
+        batch_tokens=batch_tokens,
+        prefilter_top_n=prefilter_top_n,
+        prefilter_threshold=prefilter_threshold,
+        prefilter_keywords=prefilter_keywords,
+        progress=progress
+    )
+
+
+def search_sections_batch(
+        sections: pd.DataFrame,
+        search_queries: Union[List[str], Dict[str, str]],
+        num_sections: int = 10,
+        similarity_threshold: float = 100.0,
+        batch_size: int = 64
+):
+    """
+    Semantic search for many queries, encoded together in batches.
+
+    Args:
+        sections(pd.DataFrame): DataFrame containing section data.
+        search_queries(list or dict): Queries, a dict (e.g. templates.SEARCH_QUERIES) uses its keys as query ids.
+        num_sections(int, optional): Number of semantically similar sections to extract per query
+        similarity_threshold(float, optional): Threshold for semantic similarity used to filter sections
+        batch_size(int, optional): Number of queries encoded per forward pass
+
+    Returns:
+        DataFrame with one row per (query, section): query_id, rank, section_index, the section columns and score.
+    """
+    return get_searcher(sections).semantic_batch(
+        search_queries,
+        num_sections=num_sections,
+        similarity_threshold=similarity_threshold,
+        batch_size=batch_size
+    )
 
 
 def extract_context(
@@ -90,21 +654,240 @@ def extract_context(
     return json_output
 
 
+def extraction_key(filter: pydantic.BaseModel, content: str):
+    # Identifies an extraction result by model, filter schema and section text
+    payload = json.dumps([settings.MODEL, filter.model_json_schema(), content], sort_keys=True, default=str)
+    return text_hash(payload)
+
+
+def load_checkpoint(path: str):
+    results = {}
+    if path and os.path.exists(path):
+        with open(path) as file:
+            for line in file:
+                # A line cut off by an interruption is simply extracted again
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                results[entry["key"]] = entry["analysis"]
+    return results
+
+
+def iter_extract_contexts(
+        sections: pd.DataFrame,
+        filter: pydantic.BaseModel,
+        max_concurrency: int = 8,
+        checkpoint: str = None,
+        checkpoint_every: int = 50,
+        progress: Callable[[Progress], None] = None
+):
+    """
+    Runs extract_context for all sections, with up to max_concurrency requests in parallel,
+    and yields (position, analysis) per section as results arrive, checkpointed sections first.
+
+    Args:
+        sections(pd.DataFrame): DataFrame containing section data.
+        filter(pydantic.BaseModel): Schema of the information to extract.
+        max_concurrency(int, optional): Maximum number of LLM requests in flight.
+        checkpoint(str, optional): JSON-lines file every result is appended to, flushed every checkpoint_every sections.
+            Sections already in the file are not sent again, so an interrupted run resumes where it stopped.
+        progress(Callable, optional): Called with a Progress after every section.
+    """
+    keys = [extraction_key(filter, content) for content in sections["content"]]
+    results = load_checkpoint(checkpoint)
+
+    # Sections with the same text share one request
+    positions = {}
+    for position, key in enumerate(keys):
+        positions.setdefault(key, []).append(position)
+    pending = [key for key in positions if key not in results]
+
+    tracker = Progress(len(keys))
+    if results:
+        logger.info(
+            "Resuming extraction, %d of %d sections checkpointed",
+            len(keys) - sum(len(positions[key]) for key in pending), len(keys)
+        )
+
+    def report(key, analysis):
+        for position in positions[key]:
+            tracker.update()
+            if progress is not None:
+                progress(tracker)
+            yield position, analysis
+
+    for key in positions:
+        if key in results:
+            yield from report(key, results[key])
+
+    contents = sections["content"].tolist()
+    responses = iter_query_model_concurrently(
+        settings.MODEL,
+        ([{
+            "role": "user",
+            "content": FILTER_PROMPT_TEMPLATE.format(info=filter.model_json_schema(), section=contents[positions[key][0]])
+        }] for key in pending),
+        max_concurrency=max_concurrency,
+        parse_json=True
+    )
+
+    file = open(checkpoint, "a") if checkpoint else None
+    try:
+        for completed, (number, (_, json_output)) in enumerate(responses, 1):
+            key = pending[number]
+            if file is not None:
+                file.write(json.dumps({"key": key, "analysis": json_output}) + "\n")
+                if completed % checkpoint_every == 0:
+                    file.flush()
+            yield from report(key, json_output)
+    finally:
+        if file is not None:
+            file.close()
+
+
+def extract_contexts(
+        sections: pd.DataFrame,
+        filter: pydantic.BaseModel,
+        max_concurrency: int = 8,
+        checkpoint: str = None,
+        checkpoint_every: int = 50
+):
+    """
+    Returns the extract_context result of every section in order, see iter_extract_contexts.
+    """
+    analyses = [None] * len(sections)
+    for position, analysis in iter_extract_contexts(
+            sections, filter, max_concurrency=max_concurrency, checkpoint=checkpoint, checkpoint_every=checkpoint_every):
+        analyses[position] = analysis
+    return analyses
+
+
+def analysis_items(analysis):
+    # The extracted objects of one section, non-object items are kept under "analysis"
+    if isinstance(analysis, dict):
+        analysis = [analysis]
+    for item in analysis or []:
+        yield item if isinstance(item, dict) else {"analysis": item}
+
+
+def flatten_item(item: dict, prefix: str = ""):
+    # Same column names as pd.json_normalize
+    row = {}
+    for key, value in item.items():
+        if isinstance(value, dict) and value:
+            row.update(flatten_item(value, f"{prefix}{key}."))
+        else:
+            row[f"{prefix}{key}"] = value
+    return row
+
+
+def filter_description(filter: pydantic.BaseModel):
+    # The field descriptions of a filter say what a relevant section contains
+    return " ".join(field.description or name for name, field in filter.model_fields.items())
+
+
+def evaluate_prefilter(
+        sections: pd.DataFrame,
+        description: str = "",
+        filter: pydantic.BaseModel = None,
+        top_n: int = None,
+        threshold: float = None,
+        keywords: List[str] = None,
+        sample_size: int = 100,
+        seed: int = 0
+):
+    """
+    Reports the pruning rate of a prefilter and its recall estimated against a full LLM pass on a sample.
+
+    Args:
+        sections(pd.DataFrame): DataFrame containing section data.
+        description(str, optional): Search description, defaults to the field descriptions of filter.
+        filter(pydantic.BaseModel, optional): Evaluate the prefilter for filter_and_analyze_sections with this filter.
+        top_n, threshold, keywords: Prefilter settings, see search_sections.
+        sample_size(int, optional): Number of sections the full LLM pass runs on.
+    """
+    return get_searcher(sections).evaluate_prefilter(
+        description or filter_description(filter),
+        top_n=top_n,
+        threshold=threshold,
+        keywords=keywords,
+        filter=filter,
+        sample_size=sample_size,
+        seed=seed
+    )
+
+
 def filter_and_analyze_sections(
     sections: pd.DataFrame,
-    filter: pydantic.BaseModel
+    filter: pydantic.BaseModel,
+    description: str = "",
+    prefilter_top_n: int = None,
+    prefilter_threshold: float = None,
+    prefilter_keywords: List[str] = None,
+    max_concurrency: int = 8,
+    checkpoint: str = None,
+    checkpoint_every: int = 50
 ):
-    # Apply filter to each section
-    sections['analysis'] = sections.apply(extract_context, axis=1, args=(filter,))
+    """
+    Extracts the information described by filter from each section, dropping sections without any.
 
-    sections_exploded = sections.explode('analysis')
-    sections_exploded = sections.dropna(subset=["analysis"])
-    analysis_df = pd.json_normalize(sections_exploded['analysis'])
+    With prefilter_top_n/threshold/keywords only the sections semantically closest to description
+    (defaulting to the field descriptions of filter) are sent to the LLM, see search_sections.
+    Extraction runs concurrently and can be checkpointed, see extract_contexts.
+    """
+    sections = get_searcher(sections)._llm_candidates(
+        description or filter_description(filter), prefilter_top_n, prefilter_threshold, prefilter_keywords)
 
-    # Reset the index of both DataFrames to ensure a clean join
-    sections_exploded.reset_index(drop=True, inplace=True)
-    analysis_df.reset_index(drop=True, inplace=True)
+    analyses = extract_contexts(
+        sections,
+        filter,
+        max_concurrency=max_concurrency,
+        checkpoint=checkpoint,
+        checkpoint_every=checkpoint_every
+    )
 
-    # Concatenate the original data (minus the unneeded columns) with the new analysis data
-    return pd.concat([sections_exploded.drop(columns=['analysis']), analysis_df], axis=1)
+    # One row per extracted object, sections without any are dropped
+    positions, records = [], []
+    for position, analysis in enumerate(analyses):
+        for item in analysis_items(analysis):
+            positions.append(position)
+            records.append(item)
+
+    return pd.concat([sections.iloc[positions].reset_index(drop=True), pd.json_normalize(records)], axis=1)
+
+
+def iter_filter_and_analyze_sections(
+    sections: pd.DataFrame,
+    filter: pydantic.BaseModel,
+    description: str = "",
+    prefilter_top_n: int = None,
+    prefilter_threshold: float = None,
+    prefilter_keywords: List[str] = None,
+    max_concurrency: int = 8,
+    checkpoint: str = None,
+    checkpoint_every: int = 50,
+    progress: Callable[[Progress], None] = None
+):
+    """
+    Streaming filter_and_analyze_sections: yields one dict per extracted object (section columns plus the
+    flattened object) as soon as its section is done, in completion order.
+
+    Args:
+        progress(Callable, optional): Called with a Progress (done/total, throughput, ETA) after every section,
+            e.g. progress.print_progress
+        Other arguments as in filter_and_analyze_sections.
+    """
+    sections = get_searcher(sections)._llm_candidates(
+        description or filter_description(filter), prefilter_top_n, prefilter_threshold, prefilter_keywords)
 
+    for position, analysis in iter_extract_contexts(
+            sections,
+            filter,
+            max_concurrency=max_concurrency,
+            checkpoint=checkpoint,
+            checkpoint_every=checkpoint_every,
+            progress=progress):
+        section = sections.iloc[position].to_dict()
+        for item in analysis_items(analysis):
+            yield {**section, **flatten_item(item)}
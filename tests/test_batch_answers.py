@@ -0,0 +1,32 @@
+import pytest
+
+from src.search import parse_batch_answers
+
+
+@pytest.mark.parametrize("text", [
+    "1: YES\n2: NO\n3: YES",
+    "1. yes\n2. no\n3. yes",
+    "**1**: YES\n**2**: NO\n**3**: YES",
+    "- 1: YES\n- 2: NO\n- 3: YES",
+    "Section 1: YES\nSection 2: NO\nSection 3: YES",
+    "### Section 1: YES\n### Section 2: NO\n### Section 3: YES",
+    "**Section 1**: **YES**\n**Section 2**: **NO**\n**Section 3**: **YES**",
+    "Here are my answers:\n\nSection 1 - YES, it defines the timeout.\nSection 2 - NO\nSection 3 - YES",
+])
+def test_parses_common_answer_formats(text):
+    assert parse_batch_answers(text, 3) == {1: True, 2: False, 3: True}
+
+
+def test_ignores_unknown_numbers_and_keeps_first_answer():
+    text = "Section 1: YES\nSection 4: YES\nSection 1: NO\n0: YES"
+    assert parse_batch_answers(text, 3) == {1: True}
+
+
+def test_ignores_prose_without_answers():
+    text = "Section 2 discusses congestion control.\nRFC 793 is obsoleted."
+    assert parse_batch_answers(text, 3) == {}
+
+
+def test_ignores_quoted_section_text():
+    text = "### Section 1\n\nNo implementation MUST send this.\n\n### Section 2\n\nYes values are encoded"
+    assert parse_batch_answers(text, 2) == {}
@@ -0,0 +1,29 @@
+import pytest
+
+from src.chunking import chunk_sections, chunk_text
+
+
+TEXT = " ".join(f"word{i}" for i in range(1000))
+
+
+def test_windows_share_overlap_words():
+    windows = chunk_text(TEXT, 130, overlap=26)  # 100 words per window, 20 shared
+    assert len(windows) == 13
+    assert windows[0] == (0, TEXT.index(" word100"))
+    assert TEXT[windows[1][0]:].startswith("word80 ")
+    assert windows[-1][1] == len(TEXT)
+
+
+@pytest.mark.parametrize("max_tokens, overlap", [(40, 40), (40, 64), (40, -1)])
+def test_rejects_overlap_outside_window(max_tokens, overlap):
+    with pytest.raises(AssertionError):
+        chunk_text(TEXT, max_tokens, overlap=overlap)
+    with pytest.raises(AssertionError):
+        chunk_sections([TEXT], max_tokens, overlap=overlap)
+
+
+def test_overlap_just_below_window_still_advances():
+    # 5 and 4 tokens both round down to 3 words, the overlap is cut to 2 words
+    windows = chunk_text(TEXT, 5, overlap=4)
+    assert len(windows) == 998
+    assert TEXT[slice(*windows[1])] == "word1 word2 word3"
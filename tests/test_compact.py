@@ -0,0 +1,22 @@
+import pandas as pd
+import pyarrow as pa
+
+from benchmarks.synthetic import make_corpus, write_mirror
+from src.compact import CompactCorpus
+from src.rfc import setup_rfc_datasets
+
+
+def test_section_frame_round_trip(tmp_path):
+    corpus = make_corpus(10)
+    write_mirror(corpus, tmp_path / "mirror")
+    rfc_df, section_df = setup_rfc_datasets(list(corpus), mirror_dir=tmp_path / "mirror", cache_dir=None)
+    # Non-ASCII text before the sections shifts their byte offsets against the character offsets
+    rfc_df.loc[0, "text"] = "é€😀" + rfc_df.loc[0, "text"]
+    shifted = section_df["rfc"] == rfc_df.loc[0, "rfc_number"]
+    section_df.loc[shifted, ["start", "end"]] += 3
+
+    CompactCorpus.from_frames(rfc_df, section_df).save(tmp_path / "compact")
+    frame = CompactCorpus.load(tmp_path / "compact").section_frame()
+
+    assert frame["content"].dtype == pd.ArrowDtype(pa.large_string())
+    pd.testing.assert_frame_equal(frame, section_df, check_dtype=False)
@@ -0,0 +1,39 @@
+import pytest
+import requests
+
+from src.fetch import RFC_URL, fetch_rfc_texts
+
+
+class FakeSession:
+    """
+    Serves the texts of published RFCs and a 404 page for every other number.
+    """
+
+    def __init__(self, published):
+        self.published = published
+
+    def get(self, url, headers=None, timeout=None):
+        response = requests.Response()
+        response.url = url
+        rfc = next((rfc for rfc in self.published if RFC_URL.format(rfc=rfc) == url), None)
+        response.status_code = 200 if rfc is not None else 404
+        response._content = (self.published[rfc] if rfc is not None else "<html>Not Found</html>").encode()
+        response.encoding = "utf-8"
+        return response
+
+
+def test_missing_rfc_raises_by_default():
+    with pytest.raises(FileNotFoundError):
+        fetch_rfc_texts([1, 2], cache_dir=None, session=FakeSession({1: "RFC 1"}))
+
+
+def test_skip_returns_none_for_missing_rfcs(tmp_path):
+    (tmp_path / "rfc3.txt").write_text("RFC 3")
+    texts = fetch_rfc_texts(
+        [1, 2, 3, 1], cache_dir=None, mirror_dir=tmp_path, session=FakeSession({1: "RFC 1"}), missing="skip"
+    )
+    assert texts == ["RFC 1", None, "RFC 3", "RFC 1"]
+
+
+def test_skip_offline_without_copy(tmp_path):
+    assert fetch_rfc_texts([5], cache_dir=str(tmp_path / "cache"), offline=True, missing="skip") == [None]
@@ -0,0 +1,39 @@
+import pandas as pd
+
+from src.graph import RFCGraph
+
+
+def make_graph():
+    # Section 1000/1. is updated by three sections and 1000/2. obsoleted by one; 1000 is cited by two other RFCs
+    rfc_df = pd.DataFrame({
+        "rfc_number": [1000, 2000, 3000, 4000],
+        "updates": [[], [1000], [1000], [1000]],
+        "obsoletes": [[], [], [1000], []],
+    })
+    section_df = pd.DataFrame({
+        "rfc": [1000, 1000, 2000, 3000, 4000],
+        "number": ["1.", "2.", "1.", "1.", "1."],
+        "content": ["Self citation [1000].", "Nothing cited.", "See [1000].", "See [1000] and [2000].", "No citations."],
+        "updated_by": [[(2000, "1."), (3000, "1."), (4000, "1.")], [], [], [], []],
+        "obsoleted_by": [[], [(3000, "1.")], [], [], []],
+    })
+    return RFCGraph.from_frames(rfc_df, section_df)
+
+
+def test_most_referenced_sections_counts_incoming_links():
+    assert make_graph().most_referenced_sections(k=3) == [
+        ((1000, "1."), 3),
+        ((1000, "2."), 1),
+        ((2000, "1."), 0),
+    ]
+
+
+def test_most_cited_rfcs_ignores_self_citations():
+    assert make_graph().most_cited_rfcs(k=2) == [(1000, 2), (2000, 1)]
+
+
+def test_ranking_survives_save_and_load(tmp_path):
+    graph = make_graph()
+    graph.save(tmp_path / "graph.npz")
+    loaded = RFCGraph.load(tmp_path / "graph.npz")
+    assert loaded.most_referenced_sections(k=5) == graph.most_referenced_sections(k=5)
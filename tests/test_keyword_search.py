@@ -0,0 +1,35 @@
+import pandas as pd
+
+from src.search import SectionSearcher
+
+
+SECTIONS = pd.DataFrame({
+    "rfc": [1000, 1000, 2000, 2000],
+    "number": ["1.", "2.", "1.", "2."],
+    "content": [
+        "The retransmission timeout MUST be doubled.",
+        "Keep-alive probes are sent after a timeout of two hours.",
+        "See [1000] for the certificate fields.",
+        "Nothing relevant here.",
+    ],
+})
+
+
+def test_scan_matches_each_keyword_like_str_contains(tmp_path):
+    keywords = ["timeout", "alive", r"\[\d{4}\]", "field|element", "absent", "timeout"]
+    searcher = SectionSearcher(SECTIONS, keyword_index_dir=str(tmp_path))
+
+    assert searcher.keyword_matches(keywords) == {
+        0: ["timeout"],
+        1: ["timeout", "alive"],
+        2: [r"\[\d{4}\]", "field|element"],
+    }
+    assert searcher._keyword_index is None  # scanned, not indexed
+
+
+def test_scan_and_index_agree(tmp_path):
+    keywords = ["timeout", "alive", "MUST", "certificate"]
+    searcher = SectionSearcher(SECTIONS, keyword_index_dir=str(tmp_path))
+    scanned = searcher.keyword_matches(keywords)
+    searcher.keyword_index
+    assert searcher.keyword_matches(keywords) == scanned
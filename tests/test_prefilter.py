@@ -0,0 +1,85 @@
+import hashlib
+
+import numpy as np
+import pandas as pd
+import pytest
+
+pytest.importorskip("faiss")
+index_module = pytest.importorskip("src.index")
+
+from src.registry import Registry
+from src.search import SectionSearcher
+
+
+class BagOfWordsEncoder:
+    """
+    Stands in for a SentenceTransformer: hashes the words of each text into a normalized count vector.
+    """
+    max_seq_length = 64
+
+    def __init__(self, name, *args, **kwargs):
+        pass
+
+    def to(self, device):
+        return self
+
+    def encode(self, texts, batch_size=32, **kwargs):
+        single = isinstance(texts, str)
+        texts = [texts] if single else list(texts)
+        vectors = np.zeros((len(texts), 32), dtype=np.float32)
+        for i, text in enumerate(texts):
+            for word in text.lower().split():
+                vectors[i, int(hashlib.md5(word.encode()).hexdigest(), 16) % 32] += 1
+        vectors /= np.linalg.norm(vectors, axis=1, keepdims=True) + 1e-9
+        return vectors[0] if single else vectors
+
+
+SECTIONS = pd.DataFrame({
+    "rfc": [1000] * 6,
+    "number": ["1.", "2.", "3.", "4.", "5.", "6."],
+    "content": [
+        "The retransmission timeout is doubled after each timeout.",
+        "Certificates carry an issuer field and a subject field.",
+        "A timeout closes idle connections.",
+        "Keep-alive probes detect dead peers.",
+        "The checksum covers the header.",
+        "Implementations MUST log every timeout.",
+    ],
+})
+
+
+@pytest.fixture
+def searcher(monkeypatch, tmp_path):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(index_module, "SentenceTransformer", BagOfWordsEncoder)
+    monkeypatch.setattr(index_module, "_indexes", Registry(index_module.MAX_INDEXES))
+    searcher = SectionSearcher(SECTIONS, keyword_index_dir=None)
+
+    searcher.searched_k = []
+    search = searcher.index.search
+    monkeypatch.setattr(searcher.index, "search", lambda query, k=10, **kwargs: (
+        searcher.searched_k.append(k) or search(query, k=k, **kwargs)
+    ))
+    return searcher
+
+
+def test_top_n_only_searches_top_n(searcher):
+    scores, indices = searcher.index.search("timeout", k=len(SECTIONS))
+    searcher.searched_k.clear()
+
+    candidates = searcher.prefilter("timeout", top_n=2)
+    assert searcher.searched_k == [2]
+    assert sorted(candidates.index) == sorted(indices[0][:2])
+    assert np.allclose(candidates.loc[indices[0][:2], "prefilter_score"], scores[0][:2])
+
+
+def test_threshold_searches_all_sections(searcher):
+    candidates = searcher.prefilter("timeout", top_n=1, threshold=np.inf)
+    assert searcher.searched_k == [len(SECTIONS)]
+    assert len(candidates) == len(SECTIONS)
+
+
+def test_keyword_matches_beyond_top_n_are_kept(searcher):
+    candidates = searcher.prefilter("timeout", top_n=1, keywords=["field"])
+    assert 1 in candidates.index
+    assert np.isinf(candidates.loc[1, "prefilter_score"])
@@ -0,0 +1,51 @@
+from src.ai import ResponseCache, cache_key, model_identifier
+
+
+class FakeChatModel:
+    model_name = "gpt-test"
+
+    def __init__(self, **parameters):
+        self._identifying_params = {"model_name": self.model_name, **parameters}
+
+
+def test_evicts_least_recently_used_above_max_entries(tmp_path):
+    cache = ResponseCache(str(tmp_path / "cache.sqlite"), max_entries=3)
+    for i in range(3):
+        cache.put(f"key{i}", i)
+    cache.get("key0")
+    cache.put("key3", 3)
+
+    assert cache.stats()["entries"] == 3
+    assert cache.get("key1") is None
+    assert [cache.get(f"key{i}") for i in (0, 2, 3)] == [0, 2, 3]
+
+
+def test_replacing_an_entry_keeps_the_count(tmp_path):
+    cache = ResponseCache(str(tmp_path / "cache.sqlite"), max_entries=2)
+    cache.put("key0", 0)
+    cache.put("key1", 1)
+    cache.put("key1", 2)
+
+    assert cache.get("key0") == 0 and cache.get("key1") == 2
+    assert ResponseCache(str(tmp_path / "cache.sqlite"), max_entries=2).stats()["entries"] == 2
+
+
+def test_cache_key_includes_generation_parameters():
+    messages = [{"role": "user", "content": "Summarize RFC 9293."}]
+    keys = {
+        cache_key(model, messages, False, False, None, [], {})
+        for model in (FakeChatModel(temperature=0), FakeChatModel(temperature=1), FakeChatModel(temperature=0, max_tokens=64))
+    }
+    assert len(keys) == 3
+
+
+def test_model_identifier_falls_back_to_wrapped_llm():
+    class HuggingFaceHub:
+        repo_id = "org/model"
+
+    class ChatHuggingFace:
+        llm = HuggingFaceHub()
+        model_id = None
+
+    assert model_identifier(ChatHuggingFace()) == "ChatHuggingFace/org/model"
+    assert model_identifier("llama3") == "ollama/llama3"
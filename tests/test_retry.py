@@ -0,0 +1,92 @@
+import json
+import threading
+
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+ollama = pytest.importorskip("ollama")
+
+from src.ai import is_transient_error, query_model_with_retry
+
+
+class MockOllama(BaseHTTPRequestHandler):
+    """
+    Answers /api/chat like Ollama, after failing the first `failures` calls with `status`.
+    """
+    failures = 0
+    status = 503
+    calls = 0
+
+    def log_message(self, *args):
+        pass
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        type(self).calls += 1
+        if type(self).calls <= self.failures:
+            self.reply(self.status, {"error": "server busy" if self.status >= 500 else f"model '{body['model']}' not found"})
+        else:
+            self.reply(200, {
+                "model": body["model"], "created_at": "2024-01-01T00:00:00Z", "done": True,
+                "message": {"role": "assistant", "content": "YES"},
+            })
+
+    def reply(self, status, payload):
+        data = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+
+@pytest.fixture
+def server(monkeypatch):
+    MockOllama.calls = 0
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), MockOllama)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    monkeypatch.setattr(ollama, "chat", ollama.Client(host=f"http://127.0.0.1:{httpd.server_port}").chat)
+    yield MockOllama
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def query(**kwargs):
+    return query_model_with_retry("llama3", [{"role": "user", "content": "Does it define a timeout?"}], backoff=0.01, **kwargs)
+
+
+def test_retries_server_errors_until_success(server, monkeypatch):
+    monkeypatch.setattr(server, "failures", 2)
+    message, _ = query(retries=3)
+    assert message["content"] == "YES"
+    assert server.calls == 3
+
+
+def test_gives_up_after_retries(server, monkeypatch):
+    monkeypatch.setattr(server, "failures", 10)
+    with pytest.raises(ollama.ResponseError):
+        query(retries=2)
+    assert server.calls == 3
+
+
+def test_does_not_retry_a_missing_model(server, monkeypatch):
+    monkeypatch.setattr(server, "failures", 1)
+    monkeypatch.setattr(server, "status", 404)
+    with pytest.raises(ollama.ResponseError):
+        query(retries=3)
+    assert server.calls == 1
+
+
+@pytest.mark.parametrize("error, transient", [
+    (ConnectionError("refused"), True),
+    (TimeoutError(), True),
+    (ollama.ResponseError("overloaded", 429), True),
+    (ollama.ResponseError("bad gateway", 502), True),
+    (ollama.ResponseError("model not found", 404), False),
+    (ValueError("invalid schema"), False),
+    (AssertionError("Tools and JSON parsing cannot be used simultaneously."), False),
+])
+def test_is_transient_error(error, transient):
+    assert is_transient_error(error) == transient
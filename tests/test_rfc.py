@@ -0,0 +1,55 @@
+import copy
+
+import pandas as pd
+import pytest
+
+from benchmarks.synthetic import make_corpus, write_mirror
+from src.rfc import link_sections, parse_rfc_texts, setup_rfc_datasets
+
+
+def legacy_link_sections(rfc_df, section_df):
+    # Linker before the section number index: nested iterrows over every updated/obsoleted pair of RFCs
+    for _, rfc_info in rfc_df.iterrows():
+        for updated in rfc_info["updates"]:
+            old_sections = section_df[section_df.rfc == updated]
+            for idx, old_section in old_sections.iterrows():
+                for _, potential_new_section in section_df[section_df.rfc == rfc_info["rfc_number"]].iterrows():
+                    if old_section["number"] in potential_new_section["title"] or old_section["number"] in potential_new_section["content"]:
+                        section_df.loc[idx, "updated_by"].append((rfc_info["rfc_number"], potential_new_section["number"]))
+
+        for obsoleted in rfc_info["obsoletes"]:
+            old_sections = section_df[section_df.rfc == obsoleted]
+            for idx, old_section in old_sections.iterrows():
+                for _, potential_new_section in section_df[section_df.rfc == rfc_info["rfc_number"]].iterrows():
+                    if old_section["title"] == potential_new_section["title"]:
+                        section_df.loc[idx, "obsoleted_by"].append((rfc_info["rfc_number"], potential_new_section["number"]))
+
+
+@pytest.fixture(scope="module")
+def corpus():
+    return make_corpus(40)
+
+
+def test_link_sections_matches_legacy_linker(corpus):
+    rfc_data, section_data = [], []
+    for rfc, (header_info, sections) in zip(corpus, parse_rfc_texts(list(corpus), list(corpus.values()))):
+        rfc_data.append(header_info)
+        section_data.extend({**section, "rfc": rfc, "updated_by": [], "obsoleted_by": []} for section in sections)
+    rfc_df = pd.DataFrame(rfc_data)
+    linked, legacy = pd.DataFrame(copy.deepcopy(section_data)), pd.DataFrame(copy.deepcopy(section_data))
+
+    link_sections(rfc_df, linked)
+    legacy_link_sections(rfc_df, legacy)
+
+    assert linked["updated_by"].tolist() == legacy["updated_by"].tolist()
+    assert linked["obsoleted_by"].tolist() == legacy["obsoleted_by"].tolist()
+    assert linked["updated_by"].map(len).sum() > 0 and linked["obsoleted_by"].map(len).sum() > 0
+
+
+def test_parallel_parse_matches_serial(corpus, tmp_path):
+    write_mirror(corpus, tmp_path)
+    serial = setup_rfc_datasets(list(corpus), mirror_dir=tmp_path, cache_dir=None)
+    parallel = setup_rfc_datasets(list(corpus), mirror_dir=tmp_path, cache_dir=None, parse_workers=2, parse_chunksize=3)
+
+    pd.testing.assert_frame_equal(serial[0], parallel[0])
+    pd.testing.assert_frame_equal(serial[1], parallel[1])